@@ -0,0 +1,181 @@
+import json
+import os
+import struct
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from connectiono import get_connection
+from encryptiono import derive_key, get_cipher, generate_salt, encode_kdf_params, decode_kdf_params
+from importo import import_entries
+
+# Portable vault archive (.cypher):
+#   header: MAGIC | version (1 byte) | salt (16) | nonce prefix (7) | KDF JSON length (2) | KDF JSON
+#   frames: sealed length (4) | AES-GCM ciphertext + tag of up to ARCHIVE_CHUNK_SIZE bytes
+# The frames carry one zlib stream of JSON lines, one login per line. Frame i is sealed with
+# nonce prefix | i (5 bytes), and its associated data is the header plus a byte that is 1 only
+# for the last frame, so frames cannot be reordered, dropped, or cut off after any frame but the last.
+MAGIC = b"CYPHERVA"
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = ".cypher"
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+ARCHIVE_BATCH_SIZE = 1000
+
+# scrypt is available in every supported cryptography release, so any machine can open the archive.
+# The file can be attacked offline, so it costs more than an unlock: 128 MiB per guess.
+ARCHIVE_KDF = "scrypt"
+ARCHIVE_KDF_PARAMS = {"n": 2 ** 17, "r": 8, "p": 1}
+
+_HEADER = struct.Struct(">B16s7sH")
+_FRAME_LENGTH = struct.Struct(">I")
+_MAX_FRAME_LENGTH = ARCHIVE_CHUNK_SIZE + 16
+
+def _frame_nonce(nonce_prefix, counter):
+    return nonce_prefix + counter.to_bytes(5, "big")
+
+class _FrameWriter:
+    """
+    Buffers compressed bytes and writes them out as sealed frames of ARCHIVE_CHUNK_SIZE.
+    close() seals whatever is left as the final frame, which may be empty.
+    """
+    def __init__(self, out_file, aesgcm, nonce_prefix, header):
+        self._out_file = out_file
+        self._aesgcm = aesgcm
+        self._nonce_prefix = nonce_prefix
+        self._header = header
+        self._buffer = bytearray()
+        self._counter = 0
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) > ARCHIVE_CHUNK_SIZE:
+            self._seal(bytes(self._buffer[:ARCHIVE_CHUNK_SIZE]), final = False)
+            del self._buffer[:ARCHIVE_CHUNK_SIZE]
+
+    def close(self):
+        self._seal(bytes(self._buffer), final = True)
+        self._buffer.clear()
+
+    def _seal(self, chunk, final):
+        sealed = self._aesgcm.encrypt(_frame_nonce(self._nonce_prefix, self._counter), chunk, self._header + bytes([final]))
+        self._out_file.write(_FRAME_LENGTH.pack(len(sealed)) + sealed)
+        self._counter += 1
+
+def export_archive(user_id, encryption_key, path, passphrase, progress = None):
+    """
+    Write the user's logins to an encrypted archive at path, protected by passphrase.
+    Rows are read from an open cursor ARCHIVE_BATCH_SIZE at a time, decrypted, compressed and
+    sealed as they go, so memory stays flat however large the vault is. The file appears at path
+    only once it is complete. Calls progress(done, total) after each batch. Returns the number exported.
+    """
+    conn = get_connection()
+    total = conn.execute("select count(*) from passwords where user_id = ?", (user_id,)).fetchone()[0]
+    cipher = get_cipher(encryption_key)
+
+    salt, nonce_prefix = generate_salt(), os.urandom(7)
+    kdf_json = json.dumps({"kdf": ARCHIVE_KDF, "params": encode_kdf_params(ARCHIVE_KDF_PARAMS)}).encode()
+    header = MAGIC + _HEADER.pack(ARCHIVE_VERSION, salt, nonce_prefix, len(kdf_json)) + kdf_json
+    aesgcm = AESGCM(derive_key(passphrase, salt, ARCHIVE_KDF, ARCHIVE_KDF_PARAMS))
+
+    partial_path = path + ".part"
+    done = 0
+    try:
+        with open(partial_path, "wb") as out_file:
+            out_file.write(header)
+            writer = _FrameWriter(out_file, aesgcm, nonce_prefix, header)
+            compressor = zlib.compressobj(6)
+
+            cursor = conn.execute("""select website, login_username, encrypted_password, category, favorite
+                                     from passwords where user_id = ? order by rowid""", (user_id,))
+            while True:
+                rows = cursor.fetchmany(ARCHIVE_BATCH_SIZE)
+                if not rows:
+                    break
+                passwords = cipher.decrypt_many(row[2] for row in rows)
+                lines = "".join(json.dumps({"website": website, "login_username": login_username, "password": password,
+                                            "category": category, "favorite": favorite}, separators = (",", ":")) + "\n"
+                                for (website, login_username, _, category, favorite), password in zip(rows, passwords))
+                writer.write(compressor.compress(lines.encode()))
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+
+            writer.write(compressor.flush())
+            writer.close()
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return done
+
+def read_archive(raw_file, passphrase):
+    """
+    Yield (website, login_username, password, category, favorite) entries from an archive opened
+    in binary mode, one frame at a time. Raises ValueError on a wrong passphrase or a damaged,
+    truncated or extended file; entries of earlier frames have been yielded by then.
+    """
+    magic = raw_file.read(len(MAGIC))
+    fixed = raw_file.read(_HEADER.size)
+    if magic != MAGIC or len(fixed) != _HEADER.size:
+        raise ValueError("This is not a Cypher vault archive.")
+    version, salt, nonce_prefix, kdf_length = _HEADER.unpack(fixed)
+    if version != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported archive version {version}.")
+    kdf_json = raw_file.read(kdf_length)
+    header = magic + fixed + kdf_json
+
+    try:
+        kdf_settings = json.loads(kdf_json)
+        key = derive_key(passphrase, salt, kdf_settings["kdf"], decode_kdf_params(kdf_settings["kdf"], kdf_settings["params"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"The archive header is damaged: {e}")
+
+    aesgcm = AESGCM(key)
+    decompressor = zlib.decompressobj()
+    pending = b""
+    counter = 0
+    final = False
+
+    while not final:
+        length_bytes = raw_file.read(_FRAME_LENGTH.size)
+        if len(length_bytes) != _FRAME_LENGTH.size:
+            raise ValueError("The archive is truncated.")
+        length = _FRAME_LENGTH.unpack(length_bytes)[0]
+        sealed = raw_file.read(length) if length <= _MAX_FRAME_LENGTH else b""
+        if len(sealed) != length or not sealed:
+            raise ValueError("The archive is damaged.")
+
+        nonce = _frame_nonce(nonce_prefix, counter)
+        try:
+            chunk = aesgcm.decrypt(nonce, sealed, header + b"\x00")
+        except InvalidTag:
+            try:
+                chunk = aesgcm.decrypt(nonce, sealed, header + b"\x01")
+                final = True
+            except InvalidTag:
+                raise ValueError("Wrong passphrase, or the archive is damaged." if counter == 0 else "The archive is damaged.")
+        counter += 1
+
+        pending += decompressor.decompress(chunk)
+        if final:
+            pending += decompressor.flush()
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            record = json.loads(line)
+            yield record["website"], record["login_username"], record["password"], record["category"], record["favorite"]
+
+    if raw_file.read(1) or pending or not decompressor.eof:
+        raise ValueError("The archive has unexpected data after its last frame.")
+
+def restore_archive(user_id, path, passphrase, encryption_key, progress = None):
+    """
+    Add the logins of an archive to the user's vault with import_entries(), streaming frame by frame.
+    Logins already in the vault are skipped. Calls progress(bytes_read, file_size) after each batch.
+    Returns (imported, skipped).
+    """
+    file_size = os.path.getsize(path) or 1
+
+    with open(path, "rb") as raw_file:
+        report = (lambda: progress(min(raw_file.tell(), file_size), file_size)) if progress else None
+        return import_entries(user_id, read_archive(raw_file, passphrase), encryption_key, on_batch = report)
@@ -0,0 +1,180 @@
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import connectiono
+from connectiono import get_connection, data_version
+
+# Backups are gzip-compressed database snapshots in BACKUP_DIR (next to the database), named by time
+BACKUP_DIR_NAME = "backups"
+BACKUP_PREFIX = "cyphero-"
+BACKUP_SUFFIX = ".db.gz"
+BACKUP_KEEP = 7
+
+# Pages copied per backup step; between steps other connections can write, so the app stays responsive
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.002
+
+# The scheduler writes a new generation when the newest one is this old and the vault has changed
+BACKUP_INTERVAL = 24 * 60 * 60
+BACKUP_CHECK_INTERVAL = 15 * 60
+BACKUP_STARTUP_DELAY = 30
+
+def get_backup_dir():
+    """
+    Return the directory holding the backups of the current database file.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(connectiono.DB_FILE)), BACKUP_DIR_NAME)
+
+def list_backups():
+    """
+    Return the paths of all backups, newest first.
+    """
+    return sorted(glob.glob(os.path.join(get_backup_dir(), f"{BACKUP_PREFIX}*{BACKUP_SUFFIX}")), reverse = True)
+
+def check_database(path):
+    """
+    Run PRAGMA integrity_check on a database file and make sure it holds a Cypher vault.
+    Raises ValueError describing the first problem found.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("pragma integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"Integrity check failed: {result}")
+        if not conn.execute("select 1 from sqlite_master where type = 'table' and name = 'users'").fetchone():
+            raise ValueError("The backup does not contain a Cypher vault.")
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"The backup is not a readable database: {e}")
+    finally:
+        conn.close()
+
+def _step_paused(status, remaining, total, progress = None):
+    # Called by sqlite3 after every step; the pause lets other threads take the write lock
+    if progress:
+        progress(total - remaining, total)
+    time.sleep(BACKUP_STEP_PAUSE)
+
+def create_backup(progress = None):
+    """
+    Copy the live database with the SQLite backup API, BACKUP_PAGES_PER_STEP pages at a time,
+    from a single read snapshot, so the copy is consistent while other threads keep writing. The copy is checked with
+    PRAGMA integrity_check, gzip-compressed into a new timestamped generation and
+    the oldest generations beyond BACKUP_KEEP are removed.
+    Calls progress(pages_done, pages_total) after each step. Returns the new backup's path.
+    """
+    backup_dir = get_backup_dir()
+    os.makedirs(backup_dir, exist_ok = True)
+    now = time.time()
+    path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}{BACKUP_SUFFIX}")
+    snapshot_fd, snapshot_path = tempfile.mkstemp(suffix = ".db", dir = backup_dir)
+    os.close(snapshot_fd)
+
+    # A write through any other connection restarts a backup, so the copy is read inside one
+    # WAL read transaction: every step sees the same snapshot while writers carry on
+    source = sqlite3.connect(connectiono.DB_FILE, isolation_level = None)
+    snapshot = sqlite3.connect(snapshot_path)
+    try:
+        try:
+            source.execute("begin")
+            source.execute("select count(*) from sqlite_master").fetchone()
+            source.backup(snapshot, pages = BACKUP_PAGES_PER_STEP,
+                          progress = lambda status, remaining, total: _step_paused(status, remaining, total, progress))
+            source.execute("commit")
+            # The copy inherits WAL mode; a standalone file needs a rollback journal
+            snapshot.execute("pragma journal_mode = delete")
+        finally:
+            snapshot.close()
+            source.close()
+        check_database(snapshot_path)
+
+        with open(snapshot_path, "rb") as source, gzip.open(path + ".part", "wb", compresslevel = 6) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(path + ".part", path)
+    finally:
+        for leftover in (snapshot_path, path + ".part"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    for old_backup in list_backups()[BACKUP_KEEP:]:
+        os.remove(old_backup)
+    return path
+
+def restore_backup(path, progress = None):
+    """
+    Replace the live database's contents with a backup. The backup is decompressed and
+    checked first, and the current database is itself backed up before anything changes.
+    The pages are then copied in with the backup API, so open connections on other threads
+    see the restored data on their next read. Run dbo.migrate_database() afterwards,
+    since the backup may predate the current schema.
+    Raises ValueError if the backup fails its checks.
+    """
+    os.makedirs(get_backup_dir(), exist_ok = True)
+    fd, snapshot_path = tempfile.mkstemp(suffix = ".db", dir = get_backup_dir())
+    os.close(fd)
+
+    try:
+        try:
+            with gzip.open(path, "rb") as source, open(snapshot_path, "wb") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"The backup file is damaged: {e}")
+        check_database(snapshot_path)
+
+        create_backup()
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            snapshot.backup(get_connection(), pages = BACKUP_PAGES_PER_STEP,
+                            progress = (lambda status, remaining, total: progress(total - remaining, total)) if progress else None)
+        finally:
+            snapshot.close()
+    finally:
+        os.remove(snapshot_path)
+
+def newest_backup_age():
+    """
+    Return the seconds since the newest backup was written, or None if there is none.
+    """
+    backups = list_backups()
+    return time.time() - os.path.getmtime(backups[0]) if backups else None
+
+class BackupScheduler:
+    """
+    Background thread that writes a backup generation once the newest one is BACKUP_INTERVAL
+    old, skipping intervals in which nothing was committed. Start it once the database is
+    migrated and stop it on exit.
+    """
+    def __init__(self, interval = BACKUP_INTERVAL):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._backed_up_version = None
+        self._thread = threading.Thread(target = self._run, name = "cypher-backup", daemon = True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _due(self):
+        age = newest_backup_age()
+        if age is None:
+            return True
+        return age >= self.interval and data_version() != self._backed_up_version
+
+    def _run(self):
+        if self._stopped.wait(BACKUP_STARTUP_DELAY):
+            return
+        while not self._stopped.is_set():
+            try:
+                if self._due():
+                    version = data_version()
+                    print(f"Backed up database to {create_backup()}")
+                    self._backed_up_version = version
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Scheduled backup failed: {e}")
+            self._stopped.wait(BACKUP_CHECK_INTERVAL)
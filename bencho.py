@@ -0,0 +1,469 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import connectiono
+
+# Micro-benchmarks for Cypher's hot paths. Run with: python bencho.py <name> [<name> ...]
+
+def use_temp_database():
+    """
+    Point the shared connection layer at a fresh database in a temp directory.
+    Returns the database path.
+    """
+    connectiono.close_connection()
+    path = os.path.join(tempfile.mkdtemp(prefix = "cypher-bench-"), "bench.db")
+    connectiono.DB_FILE = path
+    return path
+
+def report(label, count, seconds, unit = "ops"):
+    """
+    Print a single benchmark result line with throughput and per-item cost.
+    """
+    per_item = seconds / count * 1e6 if count else 0
+    rate = count / seconds if seconds else float("inf")
+    print(f"{label:<40} {rate:>12,.0f} {unit}/s {per_item:>10.1f} us/{unit[:-1]}")
+
+def bench_connections(iterations = 5000):
+    """
+    Compare a config lookup that opens a fresh connection per call against
+    the pooled, per-thread connection used by dbo and supacloud.
+    """
+    path = use_temp_database()
+    with connectiono.transaction() as cursor:
+        cursor.execute("create table config(key text primary key not null, value text not null)")
+        cursor.execute("insert into config (key, value) values ('max_attempts', '5')")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        cursor.execute("select value from config where key = ?", ("max_attempts",))
+        cursor.fetchone()
+        conn.close()
+    report("connect per call", iterations, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        connectiono.get_connection().execute("select value from config where key = ?", ("max_attempts",)).fetchone()
+    report("pooled connection", iterations, time.perf_counter() - start)
+
+class FakePostgrestHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for a PostgREST endpoint: accepts any write, counts the rows
+    it carried and answers after a fixed simulated network latency.
+    """
+    protocol_version = "HTTP/1.1"
+    latency = 0.01
+    rows_received = 0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body or b"[]")
+        FakePostgrestHandler.rows_received += len(payload) if isinstance(payload, list) else 1
+        time.sleep(self.latency)
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    do_PATCH = do_POST
+
+    def log_message(self, *args):
+        pass
+
+def start_fake_postgrest():
+    """
+    Serve FakePostgrestHandler on a free local port in a daemon thread. Returns the server.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePostgrestHandler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
+
+def make_password_rows(count, user_id = "bench-user"):
+    """
+    Build synthetic local password rows in get_local_passwords() column order.
+    """
+    return [(str(uuid.uuid4()), user_id, f"site{i}.com", f"user{i}", os.urandom(60), "2024-01-01 00:00:00",
+             "2024-01-01 00:00:00", "Websites", 0, 1) for i in range(count)]
+
+def bench_sync_batches(row_count = 1000, batch_sizes = (1, 50, 500)):
+    """
+    Measure upsert throughput in rows/second against a local fake PostgREST server
+    with 10 ms simulated latency, at several batch sizes.
+    """
+    from supabase import create_client
+    from supacloud import upsert_in_batches
+
+    server = start_fake_postgrest()
+    client = create_client(f"http://127.0.0.1:{server.server_port}", "bench-anon-key")
+    rows = make_password_rows(row_count)
+
+    for batch_size in batch_sizes:
+        FakePostgrestHandler.rows_received = 0
+        start = time.perf_counter()
+        upsert_in_batches(rows, client, batch_size)
+        report(f"upsert batch_size={batch_size}", FakePostgrestHandler.rows_received, time.perf_counter() - start, "rows")
+    server.shutdown()
+
+def bench_cipher(count = 20000):
+    """
+    Compare the original per-call AES-GCM path (new Cipher and encryptor/decryptor per value)
+    against the key-bound VaultCipher and its encrypt_many/decrypt_many bulk API.
+    """
+    from base64 import urlsafe_b64encode, urlsafe_b64decode
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from encryptiono import VaultCipher
+
+    key = os.urandom(32)
+    passwords = [f"correct-horse-{i}" for i in range(count)]
+
+    def per_call_encrypt(password):
+        iv = os.urandom(12)
+        encryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).encryptor()
+        ciphertext = encryptor.update(password.encode()) + encryptor.finalize()
+        return urlsafe_b64encode(iv + encryptor.tag + ciphertext).decode()
+
+    def per_call_decrypt(encrypted_password):
+        data = urlsafe_b64decode(encrypted_password.encode())
+        decryptor = Cipher(algorithms.AES(key), modes.GCM(data[:12], data[12:28])).decryptor()
+        return (decryptor.update(data[28:]) + decryptor.finalize()).decode()
+
+    start = time.perf_counter()
+    encrypted = [per_call_encrypt(password) for password in passwords]
+    report("per-call encrypt", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    [per_call_decrypt(value) for value in encrypted]
+    report("per-call decrypt", count, time.perf_counter() - start)
+
+    cipher = VaultCipher(key)
+    start = time.perf_counter()
+    encrypted = cipher.encrypt_many(passwords)
+    report("VaultCipher.encrypt_many", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    cipher.decrypt_many(encrypted)
+    report("VaultCipher.decrypt_many", count, time.perf_counter() - start)
+
+def bench_ciphertext_format(count = 20000):
+    """
+    Compare the legacy base64 ciphertext format with the binary one: bytes stored per login,
+    bytes sent to Supabase per login, and the cost of encoding, decoding and the one-time conversion.
+    """
+    import base64
+    from base64 import urlsafe_b64encode
+    from encryptiono import VaultCipher, binary_ciphertext
+
+    cipher = VaultCipher(os.urandom(32))
+    passwords = [f"correct-horse-{i}" for i in range(count)]
+    binary = cipher.encrypt_many(passwords)
+    legacy = [urlsafe_b64encode(value[1:]) for value in binary]
+
+    for label, stored in (("legacy base64", legacy), ("binary", binary)):
+        wire = [base64.b64encode(value).decode("utf-8") for value in stored]
+        print(f"{label:<16} stored {sum(map(len, stored)) / count:6.1f} B/login   sync payload {sum(map(len, wire)) / count:6.1f} B/login")
+
+    for label, stored in (("legacy base64", legacy), ("binary", binary)):
+        start = time.perf_counter()
+        cipher.decrypt_many(stored)
+        report(f"decrypt_many ({label})", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    [binary_ciphertext(value) for value in legacy]
+    report("convert legacy to binary", count, time.perf_counter() - start)
+
+def bench_generator(count = 1000, rounds = 20):
+    """
+    Compare generating passwords one at a time with the random module (the old generate_password)
+    against pwhandlero.generate_passwords and generate_passphrases, which batch their os.urandom reads.
+    """
+    import random
+    import string
+    from pwhandlero import generate_passwords, generate_passphrases
+
+    special_chars = '!@#$%^&*(),.?":{}|<>'
+    all_chars = string.ascii_letters + string.digits + special_chars
+
+    def random_module_password(length = 16, min_special_chars = 2):
+        password = [random.choice(string.ascii_lowercase), random.choice(string.ascii_uppercase), random.choice(string.digits)]
+        password += [random.choice(special_chars) for _ in range(min_special_chars)]
+        password += [random.choice(all_chars) for _ in range(length - len(password))]
+        random.shuffle(password)
+        return "".join(password)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        [random_module_password() for _ in range(count)]
+    report("random module, one at a time", count * rounds, time.perf_counter() - start, "passwords")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        generate_passwords(count)
+    report(f"generate_passwords({count})", count * rounds, time.perf_counter() - start, "passwords")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        generate_passphrases(count)
+    report(f"generate_passphrases({count})", count * rounds, time.perf_counter() - start, "passphrases")
+
+def create_bench_vault(entries, encryption_key = None, user_id = "bench-user"):
+    """
+    Create a temp database with the full schema and `entries` synthetic logins for one user.
+    Passwords are encrypted with encryption_key, or filled with random bytes when it is None.
+    """
+    import dbo
+    from encryptiono import get_cipher
+
+    use_temp_database()
+    dbo.init_database()
+    categories = ("Websites", "Games", "Banks", "Work", "Socials", "Email", "Shopping", "Personal", "Other")
+    plain_passwords = [f"secret-{i}" for i in range(entries)]
+    encrypted = get_cipher(encryption_key).encrypt_many(plain_passwords) if encryption_key else None
+
+    with connectiono.transaction() as cursor:
+        cursor.executemany("insert into passwords (id, user_id, website, login_username, encrypted_password, category, favorite) values (?, ?, ?, ?, ?, ?, ?)",
+                           ((str(uuid.uuid4()), user_id, f"site{i}.com", f"user{i}@example.com",
+                             encrypted[i] if encrypted else os.urandom(60), categories[i % len(categories)], int(i % 10 == 0))
+                            for i in range(entries)))
+    return user_id
+
+def bench_rekey(sizes = (1000, 10000, 50000)):
+    """
+    Time the streaming re-key pipeline at several vault sizes to show that per-entry cost stays flat.
+    """
+    from rekeyo import start_rekey, run_rekey, finish_rekey
+
+    old_key, new_key = os.urandom(32), os.urandom(32)
+    for entries in sizes:
+        user_id = create_bench_vault(entries, old_key)
+        with connectiono.transaction() as cursor:
+            cursor.execute("insert into users (id, username, password_hash, salt) values (?, ?, ?, ?)", (user_id, "bench@example.com", b"", b""))
+
+        start = time.perf_counter()
+        start_rekey(user_id, old_key, new_key, os.urandom(16), "scrypt", {"n": 2 ** 14, "r": 8, "p": 1})
+        run_rekey(user_id, old_key, new_key)
+        finish_rekey(user_id)
+        report(f"re-key {entries:,} logins", entries, time.perf_counter() - start, "logins")
+
+def bench_import(sizes = (1000, 10000, 50000)):
+    """
+    Time a Chrome CSV import at several sizes against the per-entry store_password() path it replaces.
+    """
+    import csv
+    import dbo
+    from importo import import_logins
+
+    key = os.urandom(32)
+    for entries in sizes:
+        user_id = create_bench_vault(0)
+        path = os.path.join(os.path.dirname(connectiono.DB_FILE), "export.csv")
+        with open(path, "w", newline = "") as export_file:
+            writer = csv.writer(export_file)
+            writer.writerow(("name", "url", "username", "password", "note"))
+            writer.writerows((f"site{i}", f"https://site{i}.com/login", f"user{i}@example.com", f"secret-{i}", "") for i in range(entries))
+
+        start = time.perf_counter()
+        import_logins(user_id, path, key)
+        report(f"import {entries:,} logins", entries, time.perf_counter() - start, "logins")
+
+    sample = min(sizes)
+    user_id = create_bench_vault(0)
+    start = time.perf_counter()
+    for i in range(sample):
+        dbo.store_password(user_id, f"site{i}.com", f"user{i}@example.com", f"secret-{i}", "Websites", key, ".com")
+    report(f"store_password x {sample:,}", sample, time.perf_counter() - start, "logins")
+
+def bench_archive(sizes = (10000, 100000)):
+    """
+    Time exporting a vault to an encrypted archive and restoring it into an empty vault.
+    Export memory stays flat because rows are streamed from the cursor.
+    """
+    from archiveo import export_archive, restore_archive
+
+    key = os.urandom(32)
+    for entries in sizes:
+        user_id = create_bench_vault(entries, key)
+        path = os.path.join(os.path.dirname(connectiono.DB_FILE), "vault.cypher")
+
+        start = time.perf_counter()
+        export_archive(user_id, key, path, "bench passphrase")
+        report(f"export {entries:,} logins", entries, time.perf_counter() - start, "logins")
+
+        start = time.perf_counter()
+        restore_archive("restored-user", path, "bench passphrase", key)
+        report(f"restore {entries:,} logins", entries, time.perf_counter() - start, "logins")
+
+def bench_backup(entries = 100000):
+    """
+    Time a backup generation of a large vault while another thread keeps writing, and the verified restore.
+    """
+    import dbo
+    from backupo import create_backup, restore_backup
+
+    key = os.urandom(32)
+    user_id = create_bench_vault(entries, key)
+    dbo.migrate_database()
+    stopped = threading.Event()
+    write_times = []
+
+    def writer():
+        i = 0
+        while not stopped.is_set():
+            start = time.perf_counter()
+            dbo.store_password(user_id, f"live{i}.com", "user", "secret", "Websites", key, ".com")
+            write_times.append(time.perf_counter() - start)
+            i += 1
+
+    thread = threading.Thread(target = writer)
+    thread.start()
+    start = time.perf_counter()
+    path = create_backup()
+    elapsed = time.perf_counter() - start
+    stopped.set()
+    thread.join()
+    report(f"backup {entries:,} logins", entries, elapsed, "logins")
+    print(f"{len(write_times)} concurrent writes, slowest {max(write_times) * 1000:.1f} ms, backup {os.path.getsize(path) / 1e6:.1f} MB "
+          f"of {os.path.getsize(connectiono.DB_FILE) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    restore_backup(path)
+    report(f"restore {entries:,} logins", entries, time.perf_counter() - start, "logins")
+
+def bench_search(entries = 100000, queries = ("g", "si", "site1", "site4242", "user42 com", "banks", "nomatch"), iterations = 50):
+    """
+    Time dbo.search_logins (FTS5 match, join and LoginRecord construction) on a large vault.
+    """
+    import dbo
+
+    user_id = create_bench_vault(entries)
+    for text in queries:
+        dbo.search_logins(user_id, None, text)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            results = dbo.search_logins(user_id, None, text)
+        seconds = time.perf_counter() - start
+        print(f"{'search ' + repr(text):<40} {seconds / iterations * 1000:>8.2f} ms/query   {len(results):>4} results")
+
+def bench_fuzzy(entries = 100000, queries = ("gihtub", "gogle", "amazn", "netflix", "mail.google", "zzqx"), iterations = 50):
+    """
+    Time fuzzyo.find_similar_websites on a vault of word-like website names against a
+    difflib scan of every saved website, the obvious implementation without an index.
+    """
+    import random
+    from difflib import SequenceMatcher
+    from fuzzyo import find_similar_websites, rebuild_website_index, website_key, FUZZY_MIN_SCORE
+
+    user_id = create_bench_vault(entries)
+    rng = random.Random(42)
+    syllables = ("ba", "co", "de", "fi", "go", "ha", "ki", "lu", "ma", "ne", "po", "ra", "si", "tu", "vo", "xe", "yo", "zu")
+    names = ["github.com", "google.com", "mail.google.com", "amazon.com", "netflix.com"]
+    names += ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))) + rng.choice((".com", ".net", ".org", ".io")) for _ in range(entries - len(names))]
+    with connectiono.transaction() as cursor:
+        cursor.executemany("update passwords set website = ? where rowid = ?", ((name, rowid) for rowid, name in enumerate(names, start = 1)))
+        rebuild_website_index(cursor)
+
+    websites = [row[0] for row in connectiono.get_connection().execute("select distinct website from passwords where user_id = ?", (user_id,))]
+    for text in queries:
+        find_similar_websites(user_id, text)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            results = find_similar_websites(user_id, text)
+        seconds = time.perf_counter() - start
+        best = results[0][0] if results else "-"
+        print(f"{'trigram ' + repr(text):<40} {seconds / iterations * 1000:>8.2f} ms/query   best {best}")
+
+    for text in queries[:2]:
+        key = website_key(text)
+        start = time.perf_counter()
+        [website for website in websites if SequenceMatcher(None, key, website_key(website)).ratio() >= FUZZY_MIN_SCORE]
+        print(f"{'full scan ' + repr(text):<40} {(time.perf_counter() - start) * 1000:>8.2f} ms/query   ({len(websites):,} websites)")
+
+def _paint_login_list(db_path, mode, queue):
+    """
+    Child process body for bench_list_paint: open the vault, build the "All Logins" list
+    the given way and report (seconds to first paint, peak RSS in KiB) through the queue.
+    """
+    import resource
+    import customtkinter as ctk
+    import dbo
+    from virtuallisto import VirtualList, PagedRows
+
+    connectiono.DB_FILE = db_path
+    root = ctk.CTk()
+    root.geometry("570x565")
+    root.update()
+
+    start = time.perf_counter()
+    if mode == "virtual":
+        rows = PagedRows(lambda offset, limit: dbo.get_login_data("bench-user", None, "All", None, limit, offset), dbo.count_logins("bench-user", "All"))
+        login_list = VirtualList(root, rows, lambda login_data: f"{login_data[1]} | {login_data[0]}", lambda login_data: None)
+        login_list.pack(fill = "both", expand = True)
+    else:
+        login_list = ctk.CTkScrollableFrame(root, orientation = "vertical")
+        login_list.pack(fill = "both", expand = True)
+        for login_data in dbo.get_login_data("bench-user", None, "All"):
+            login_frame = ctk.CTkFrame(login_list, fg_color = "transparent")
+            login_frame.pack(pady = 5, fill = "x")
+            ctk.CTkButton(login_frame, text = f"{login_data[1]} | {login_data[0]}", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13)).pack(pady = 5)
+    root.update()
+    seconds = time.perf_counter() - start
+
+    queue.put((seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    root.destroy()
+
+def bench_list_paint(sizes = (10000, 100000), legacy_limit = 10000):
+    """
+    Measure time-to-first-paint and peak RSS of the login list for synthetic vaults,
+    comparing one widget per login (the old show_category) against VirtualList.
+    Each measurement runs in a fresh process so peak RSS is not carried over.
+    The widget-per-login list is only built up to legacy_limit entries, past which it takes minutes.
+    Needs a display.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    for entries in sizes:
+        create_bench_vault(entries)
+        for mode in ("legacy", "virtual"):
+            if mode == "legacy" and entries > legacy_limit:
+                continue
+            queue = context.Queue()
+            child = context.Process(target = _paint_login_list, args = (connectiono.DB_FILE, mode, queue))
+            child.start()
+            child.join()
+            if child.exitcode != 0:
+                print(f"{mode} {entries:,}: list process failed (exit code {child.exitcode})")
+                return
+            seconds, peak_rss = queue.get()
+            print(f"{mode + ' ' + format(entries, ','):<40} first paint {seconds * 1000:>9.1f} ms   peak RSS {peak_rss / 1024:>7.1f} MiB")
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "sync_batches": bench_sync_batches,
+    "cipher": bench_cipher,
+    "ciphertext_format": bench_ciphertext_format,
+    "generator": bench_generator,
+    "rekey": bench_rekey,
+    "import": bench_import,
+    "archive": bench_archive,
+    "backup": bench_backup,
+    "search": bench_search,
+    "fuzzy": bench_fuzzy,
+    "list_paint": bench_list_paint,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Choose from: {', '.join(BENCHMARKS)}")
+            continue
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
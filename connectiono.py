@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_FILE = 'cyphero.db'
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a connection waits for another thread's write transaction before giving up with "database is locked"
+BUSY_TIMEOUT = 10
+
+# Per-connection tuning; journal_mode is persistent and set once by dbo.migrate_database()
+CONNECTION_PRAGMAS = (
+    "pragma synchronous = normal",
+    "pragma cache_size = -16000",
+    "pragma mmap_size = 134217728",
+    "pragma temp_store = memory",
+)
+
+# One warm connection per thread; sqlite3 connections may not be shared across threads
+_local = threading.local()
+
+# Number of transactions committed by any thread, used by the UI to tell when cached screens are stale
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+def get_connection():
+    """
+    Return this thread's long-lived connection to DB_FILE, opening it on first use.
+    The connection runs in autocommit mode; use transaction() to group writes.
+    Prepared statements are kept in the connection's statement cache between calls.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, isolation_level = None, timeout = BUSY_TIMEOUT, cached_statements = STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+def close_connection():
+    """
+    Close this thread's connection if one is open. The next get_connection() reopens it.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.depth = 0
+
+def data_version():
+    """
+    Return a counter that increases every time a transaction() commits on any thread.
+    """
+    return _data_version
+
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+@contextmanager
+def transaction():
+    """
+    Run the enclosed statements as a single write transaction on this thread's connection.
+    Yields a cursor. Commits when the block exits normally and rolls back on error.
+    Nested transaction() blocks join the outermost transaction.
+    The write lock is taken up front (begin immediate): a deferred transaction that reads and then
+    writes fails at once with SQLITE_BUSY_SNAPSHOT in WAL mode if another connection committed in
+    between, and the busy timeout does not retry that, while waiting for the lock here is retried.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield cursor
+        finally:
+            _local.depth -= 1
+            cursor.close()
+        return
+
+    conn.execute("begin immediate")
+    _local.depth = 1
+    try:
+        yield cursor
+        conn.execute("commit")
+    except BaseException:
+        conn.execute("rollback")
+        raise
+    else:
+        _bump_data_version()
+    finally:
+        _local.depth = 0
+        cursor.close()
@@ -1,18 +1,40 @@
 import base64
 import os
-import shutil
+import re
 import sqlite3
+import threading
 import time
 import uuid
+from collections import OrderedDict
 from urllib.parse import urlparse
-from supacloud import sync_all_to_supabase, set_last_synced_time
-from encryptiono import encrypt_password, decrypt_password, generate_salt, derive_key, hash_master_password, check_master_password
+from connectiono import DB_FILE, get_connection, transaction
+from cryptography.exceptions import InvalidTag
+from supacloud import sync_all_to_supabase, is_missing_column_error
+from encryptiono import (encrypt_password, decrypt_password, generate_salt, derive_key, hash_master_password, check_master_password,
+                         get_session_key, session_password_matches, preferred_kdf, calibrate_kdf, encode_kdf_params,
+                         decode_kdf_params, generate_data_key, wrap_data_key, unwrap_data_key, binary_ciphertext,
+                         CIPHERTEXT_VERSION, LEGACY_KDF)
+from rekeyo import start_rekey, run_rekey, finish_rekey, get_rekey_job, recover_rekey_keys
+from fuzzyo import index_websites, prune_websites, rebuild_website_index
+from outboxo import enqueue_change
+from backupo import create_backup
 
 THEME_FILE = "theme.txt"
 APPEAR_FILE = "appear.txt"
 REMEMBER_ME_FILE = "remember_me.txt"
-DB_FILE = 'cyphero.db'
-DB_BACKUP_FILE = 'cyphero_backup.db'
+
+# Decrypted passwords are kept briefly so reopening or copying an entry skips AES-GCM
+PASSWORD_CACHE_SIZE = 64
+PASSWORD_CACHE_TTL = 60
+
+_password_cache = OrderedDict()
+_password_cache_lock = threading.Lock()
+
+# Most results search_logins returns; a search is for picking one login, not browsing
+SEARCH_LIMIT = 200
+
+# Columns of the Supabase users table that key upgrades read and push; supabase_setup.sql adds them
+CLOUD_KEY_COLUMNS = ("kdf", "kdf_params", "wrapped_key")
 
 # Preference file functions
 
@@ -74,19 +96,20 @@ def load_username(remember_var, username_entry):
             username_entry.insert(0, saved_username)
             remember_var.set("on")
 
-def backup_database():
+def backup_database(progress = None):
     """
-    Create a backup copy of the main database file.
-    Returns True on success, False on I/O failure or if DB_FILE doesn't exist.
+    Write a new verified, compressed backup generation of the database (see backupo.create_backup).
+    Returns True on success, False on I/O failure, a failed integrity check or if DB_FILE doesn't exist.
     """
     if os.path.exists(DB_FILE):
         try:
             print('Backing up existing database...')
-            shutil.copy(DB_FILE, DB_BACKUP_FILE)
+            print(f'Database backed up to {create_backup(progress)}')
             return True
-        except IOError as e:
+        except (sqlite3.Error, OSError, ValueError) as e:
             print(f'Could not backup database: {e}')
             return False
+    return False
 
 def database_exists():
     """
@@ -96,11 +119,8 @@ def database_exists():
     if not os.path.exists(DB_FILE):
         return False
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("""select name from sqlite_master where type = 'table' and name = 'users';""")
+        cursor = get_connection().execute("""select name from sqlite_master where type = 'table' and name = 'users';""")
         table_exists = cursor.fetchall()
-        conn.close()
         return bool(table_exists)
     except sqlite3.Error:
         print('Database is corrupted! Attempting recovery...')
@@ -111,82 +131,259 @@ def init_database():
     Initialize the database schema by creating tables for users, passwords,
     login_attempts, and config if they do not already exist. Also inserts default config values.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with transaction() as cursor:
+        cursor.execute("""
+        create table if not exists users(
+        id text primary key not null,
+        username text unique not null,
+        password_hash text not null,
+        salt blob not null)
+        """)
+
+        cursor.execute("""
+        create table if not exists passwords(
+        id text primary key not null,
+        user_id integer not null,
+        website text not null,
+        login_username text not null,
+        encrypted_password blob not null,
+        created_on timestamp default current_timestamp,
+        last_modified timestamp default current_timestamp,
+        category text not null,
+        favorite integer default 0,
+        syncable integer default 1,
+        foreign key (user_id) references users(id) on delete cascade)
+        """)
+
+        cursor.execute("""
+        create table if not exists login_attempts(
+        username text primary key not null,
+        attempts integer not null,
+        last_attempt timestamp not null)
+        """)
+
+        cursor.execute("""
+        create table if not exists config(
+        key text primary key not null,
+        value text not null)
+        """)
+
+        default_configs = {
+            "max_attempts": "5",
+            "lockout_time": "60"
+        }
+
+        for key, value in default_configs.items():
+            cursor.execute("insert or ignore into config (key, value) values(?, ?)", (key, value))
+
+    migrate_database()
+
+def _add_query_indexes(cursor):
+    """
+    Schema version 1: composite indexes for the per-user list, favorites, edit and sync queries.
+    """
+    cursor.execute("create index if not exists idx_passwords_user_category on passwords(user_id, category)")
+    cursor.execute("create index if not exists idx_passwords_user_favorite on passwords(user_id, favorite)")
+    cursor.execute("create index if not exists idx_passwords_user_website on passwords(user_id, website, login_username)")
+    cursor.execute("create index if not exists idx_passwords_sync on passwords(syncable, last_modified)")
 
+def _add_session_key_cache_config(cursor):
+    """
+    Schema version 2: config switch for the in-memory session key cache (1 = on, 0 = off).
+    """
+    cursor.execute("insert or ignore into config (key, value) values('session_key_cache', '1')")
+
+def _add_user_kdf_columns(cursor):
+    """
+    Schema version 3: record which KDF and parameters produced each user's key.
+    Existing users keep the legacy PBKDF2 settings until their next login upgrades them.
+    """
+    cursor.execute(f"alter table users add column kdf text not null default '{LEGACY_KDF}'")
+    cursor.execute("alter table users add column kdf_params text")
+    cursor.execute("insert or ignore into config (key, value) values('kdf_target_ms', '500')")
+
+def _add_rekey_jobs_table(cursor):
+    """
+    Schema version 4: durable state for restartable re-key jobs (see rekeyo).
+    """
+    cursor.execute("""
+    create table if not exists rekey_jobs(
+    user_id text primary key not null,
+    new_salt blob not null,
+    new_kdf text not null,
+    new_kdf_params text,
+    new_password_hash blob,
+    old_key_wrapped blob not null,
+    new_key_wrapped blob not null,
+    last_rowid integer not null default 0,
+    started_on timestamp default current_timestamp)
+    """)
+
+def _add_search_index(cursor):
+    """
+    Schema version 5: FTS5 index over website, username and category for search_logins().
+    It stores no copy of the text (content='passwords') and is kept in step by triggers,
+    so every write path, including cloud sync, updates it.
+    """
     cursor.execute("""
-    create table if not exists users(
-    id text primary key not null,
-    username text unique not null,
-    password_hash text not null,
-    salt blob not null)
+    create virtual table if not exists passwords_fts using fts5(
+    website, login_username, category,
+    content = 'passwords', content_rowid = 'rowid', prefix = '1 2 3', tokenize = 'unicode61 remove_diacritics 2')
     """)
 
     cursor.execute("""
-    create table if not exists passwords(
-    id text primary key not null,
-    user_id integer not null,
+    create trigger if not exists passwords_fts_insert after insert on passwords begin
+    insert into passwords_fts(rowid, website, login_username, category) values (new.rowid, new.website, new.login_username, new.category);
+    end
+    """)
+
+    cursor.execute("""
+    create trigger if not exists passwords_fts_delete after delete on passwords begin
+    insert into passwords_fts(passwords_fts, rowid, website, login_username, category) values ('delete', old.rowid, old.website, old.login_username, old.category);
+    end
+    """)
+
+    cursor.execute("""
+    create trigger if not exists passwords_fts_update after update of website, login_username, category on passwords begin
+    insert into passwords_fts(passwords_fts, rowid, website, login_username, category) values ('delete', old.rowid, old.website, old.login_username, old.category);
+    insert into passwords_fts(rowid, website, login_username, category) values (new.rowid, new.website, new.login_username, new.category);
+    end
+    """)
+
+    cursor.execute("insert into passwords_fts(passwords_fts) values ('rebuild')")
+
+def _add_website_trigram_index(cursor):
+    """
+    Schema version 6: trigram index over each user's distinct websites for fuzzy lookups
+    (fuzzyo.find_similar_websites). Written alongside passwords by the write paths,
+    and filled here from the existing logins.
+    """
+    cursor.execute("""
+    create table if not exists website_trigrams(
+    user_id text not null,
+    trigram text not null,
     website text not null,
-    login_username text not null,
-    encrypted_password blob not null,
-    created_on timestamp default current_timestamp,
-    last_modified timestamp default current_timestamp,
-    category text not null,
-    favorite integer default 0,
-    syncable integer default 1,
-    foreign key (user_id) references users(id) on delete cascade)
+    primary key (user_id, trigram, website)) without rowid
     """)
+    cursor.execute("create index if not exists idx_website_trigrams_website on website_trigrams(user_id, website)")
+    rebuild_website_index(cursor)
 
+def _add_sessions_table(cursor):
+    """
+    Schema version 7: sealed Supabase refresh tokens, so an unlock can resume the cloud
+    session with a token refresh instead of a password sign-in (supacloud.resume_session).
+    """
     cursor.execute("""
-    create table if not exists login_attempts(
-    username text primary key not null,
-    attempts integer not null,
-    last_attempt timestamp not null)
+    create table if not exists sessions(
+    user_id text primary key not null,
+    sealed_refresh_token blob not null,
+    updated_on timestamp default current_timestamp)
     """)
 
+def _add_outbox_table(cursor):
+    """
+    Schema version 8: outbox of local changes waiting to be pushed to Supabase (outboxo).
+    Entries are written in the same transaction as the change they describe.
+    """
     cursor.execute("""
-    create table if not exists config(
-    key text primary key not null,
-    value text not null)
+    create table if not exists outbox(
+    seq integer primary key autoincrement,
+    user_id text not null,
+    password_id text not null,
+    operation text not null,
+    queued_on timestamp default current_timestamp)
     """)
+    cursor.execute("create index if not exists idx_outbox_user on outbox(user_id, seq)")
 
-    default_configs = {
-        "max_attempts": "5",
-        "lockout_time": "60"
-    }
+def _add_data_key_columns(cursor):
+    """
+    Schema version 9: users.wrapped_key holds the vault's random data key sealed with the
+    master-password key, and rekey_jobs carries the new sealed copy while logins are re-encrypted.
+    Existing vaults have no data key until their next login migrates them (upgrade_user_key).
+    """
+    cursor.execute("alter table users add column wrapped_key blob")
+    cursor.execute("alter table rekey_jobs add column new_wrapped_data_key blob")
 
-    for key, value in default_configs.items():
-        cursor.execute("insert or ignore into config (key, value) values(?, ?)", (key, value))
+def _convert_ciphertexts_to_binary(cursor):
+    """
+    Schema version 10: store every ciphertext as raw CIPHERTEXT_VERSION + IV + tag + ciphertext bytes
+    instead of base64 text. Only the encoding changes, so no key is needed and last_modified is left
+    alone; the cloud copies stay in the old format until they next change, and both formats decrypt.
+    Values that are not valid base64 are left as they are.
+    """
+    last_rowid = 0
+    while True:
+        rows = cursor.execute("""select rowid, encrypted_password from passwords
+                                 where rowid > ? and substr(encrypted_password, 1, 1) != ? order by rowid limit 1000""",
+                              (last_rowid, CIPHERTEXT_VERSION)).fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+
+        converted = []
+        for rowid, encrypted_password in rows:
+            if isinstance(encrypted_password, str):
+                encrypted_password = encrypted_password.encode()
+            try:
+                converted.append((binary_ciphertext(encrypted_password), rowid))
+            except ValueError:
+                print(f'Leaving an unreadable stored password (row {rowid}) unconverted.')
+        cursor.executemany("update passwords set encrypted_password = ? where rowid = ?", converted)
+
+# Ordered schema migrations; a migration's position in this list is its schema version
+SCHEMA_MIGRATIONS = [
+    _add_query_indexes,
+    _add_session_key_cache_config,
+    _add_user_kdf_columns,
+    _add_rekey_jobs_table,
+    _add_search_index,
+    _add_website_trigram_index,
+    _add_sessions_table,
+    _add_outbox_table,
+    _add_data_key_columns,
+    _convert_ciphertexts_to_binary,
+]
+
+def migrate_database():
+    """
+    Upgrade an existing database in place to the latest schema version.
+    Switches the journal to WAL and applies each pending migration in its own transaction,
+    recording progress in PRAGMA user_version.
+    """
+    conn = get_connection()
+    conn.execute("pragma journal_mode = wal")
 
-    conn.commit()
-    conn.close()
+    version = conn.execute("pragma user_version").fetchone()[0]
+    for target_version, migration in enumerate(SCHEMA_MIGRATIONS[version:], start = version + 1):
+        with transaction() as cursor:
+            migration(cursor)
+            cursor.execute(f"pragma user_version = {target_version}")
+        print(f'Database schema upgraded to version {target_version}.')
+    conn.execute("pragma optimize")
 
 def get_config_value(key):
     """
     Retrieve an integer configuration value by key from the config table.
     Returns None if key is not found.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("select value from config where key = ?", (key,))
+    cursor = get_connection().execute("select value from config where key = ?", (key,))
     result = cursor.fetchone()
-    conn.close()
     return int(result[0]) if result else None
 
-def create_user(username, master_password, supabase_user_id, salt = None):
+def get_config_text(key):
     """
-    Add a new user locally with hashed master password and salt.
-    Returns False if username exists or insertion fails.
+    Retrieve a raw string configuration value by key, or None if the key is not found.
     """
+    cursor = get_connection().execute("select value from config where key = ?", (key,))
+    result = cursor.fetchone()
+    return result[0] if result else None
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    #check if username is taken
-    cursor.execute("select id from users where username = ?", (username,))
-    if cursor.fetchone():
-        conn.close()
-        return False #username exists
+def create_user(username, master_password, supabase_user_id, salt = None, kdf = LEGACY_KDF, kdf_params = None, wrapped_key = None):
+    """
+    Add a new user locally with hashed master password, salt, the KDF settings for their key
+    and, for vaults that have one, their wrapped data key.
+    Returns False if username exists or insertion fails.
+    """
 
     if salt is None:
         salt = generate_salt()
@@ -195,30 +392,34 @@ def create_user(username, master_password, supabase_user_id, salt = None):
     password_hash = hash_master_password(master_password)
 
     try:
-        cursor.execute("insert into users (id, username, password_hash, salt) values(?, ?, ?, ?)", (supabase_user_id, username, password_hash, salt))
-        conn.commit()
+        with transaction() as cursor:
+            #check if username is taken
+            cursor.execute("select id from users where username = ?", (username,))
+            if cursor.fetchone():
+                return False #username exists
+
+            cursor.execute("insert into users (id, username, password_hash, salt, kdf, kdf_params, wrapped_key) values(?, ?, ?, ?, ?, ?, ?)", (supabase_user_id, username, password_hash, salt, kdf, kdf_params, wrapped_key))
         print(f'User {username} created successfully!')
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def verify_user(username, password):
     """
     Validate given credentials against stored hash; return user_id if successful.
+    While a master password change is being re-keyed, the new password is accepted too.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     try:
-        cursor.execute("select id, password_hash from users where username = ?", (username,))
+        cursor = get_connection().execute("""select users.id, users.password_hash, rekey_jobs.new_password_hash from users
+                                             left join rekey_jobs on rekey_jobs.user_id = users.id where users.username = ?""", (username,))
         user = cursor.fetchone()
-        conn.close()
 
         if user:
             try:
                 if check_master_password(password, user[1]):
                     return user[0]
+                if user[2] is not None and check_master_password(password, user[2]):
+                    return user[0]
             except ValueError:
                 print('Error: Stored password is corrupted or invalid.')
                 return None
@@ -234,60 +435,264 @@ def user_exists(username):
     """
     Return True if given username is found locally.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("select id from users where username = ?", (username,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
+    cursor = get_connection().execute("select id from users where username = ?", (username,))
+    return cursor.fetchone() is not None
 
 def get_user_salt(user_id):
     """
     Retrieve raw salt bytes for a user, or None if missing.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("select salt from users where id = ?", (user_id,))
+    cursor = get_connection().execute("select salt from users where id = ?", (user_id,))
     salt = cursor.fetchone()
-    conn.close()
 
     if salt[0]:
-        return salt[0]
+        # Older password changes stored the salt base64-encoded
+        return base64.b64decode(salt[0]) if isinstance(salt[0], str) else salt[0]
     else:
         return None
 
+def get_kdf_settings():
+    """
+    Return (kdf, params) to use for newly derived keys on this machine.
+    Parameters are calibrated once to the 'kdf_target_ms' unlock time and cached in config.
+    """
+    kdf = preferred_kdf()
+    cached_params = get_config_text(f"kdf_params:{kdf}")
+    if cached_params:
+        return kdf, decode_kdf_params(kdf, cached_params)
+
+    params = calibrate_kdf(kdf, (get_config_value("kdf_target_ms") or 500) / 1000)
+    with transaction() as cursor:
+        cursor.execute("insert or replace into config (key, value) values (?, ?)", (f"kdf_params:{kdf}", encode_kdf_params(params)))
+    return kdf, params
+
+def get_user_kdf(user_id):
+    """
+    Return (salt, kdf, params) recorded for a user's key.
+    """
+    cursor = get_connection().execute("select kdf, kdf_params from users where id = ?", (user_id,))
+    kdf, kdf_params = cursor.fetchone()
+    return get_user_salt(user_id), kdf, decode_kdf_params(kdf, kdf_params)
+
+def get_wrapped_data_key(user_id):
+    """
+    Return the user's data key sealed with their master-password key, or None for a vault that has no data key yet.
+    """
+    return get_connection().execute("select wrapped_key from users where id = ?", (user_id,)).fetchone()[0]
+
+def derive_user_key(user_id, master_password):
+    """
+    Return the key that encrypts a user's logins: their data key, unsealed with the key derived
+    from the master password, or the derived key itself for a vault that has no data key yet.
+    """
+    salt, kdf, params = get_user_kdf(user_id)
+    master_key = derive_key(master_password, salt, kdf, params)
+    wrapped_key = get_wrapped_data_key(user_id)
+    return unwrap_data_key(master_key, wrapped_key) if wrapped_key else master_key
+
+def user_needs_key_upgrade(user_id):
+    """
+    Return True if the user's vault has no data key yet, or its master key was derived
+    with a different KDF than this machine prefers.
+    """
+    return get_wrapped_data_key(user_id) is None or get_user_kdf(user_id)[1] != preferred_kdf()
+
+def _remember_key_push_base(cursor, user_id, wrapped_key = None, replace = False):
+    """
+    Record the wrapped data key the cloud users row is expected to hold when a key change is pushed:
+    by default the user's current one, kept across further changes until the push, or wrapped_key with replace.
+    An empty value stands for a cloud row without a data key.
+    """
+    if not replace:
+        wrapped_key = cursor.execute("select wrapped_key from users where id = ?", (user_id,)).fetchone()[0]
+    base = base64.b64encode(wrapped_key).decode("utf-8") if wrapped_key else ""
+    cursor.execute(f"insert or {'replace' if replace else 'ignore'} into config (key, value) values (?, ?)", (f"key_push_base:{user_id}", base))
+
+def rewrap_data_key(user_id, data_key, new_master_key, new_salt, new_kdf, new_kdf_params, new_password_hash = None):
+    """
+    Seal the user's data key with a new master key and record the salt, KDF settings and optional
+    password hash that produce it, in one transaction. The logins are untouched, so this costs the
+    same for any vault size. The change is flagged for push_pending_key_change().
+    """
+    with transaction() as cursor:
+        _remember_key_push_base(cursor, user_id)
+        if new_password_hash is not None:
+            cursor.execute("update users set password_hash = ? where id = ?", (new_password_hash, user_id))
+        cursor.execute("update users set wrapped_key = ?, salt = ?, kdf = ?, kdf_params = ? where id = ?",
+                       (wrap_data_key(new_master_key, data_key), new_salt, new_kdf, encode_kdf_params(new_kdf_params), user_id))
+        # A pending re-encryption upload must not be downgraded to a key-only one
+        cursor.execute("insert or ignore into config (key, value) values (?, 'key')", (f"key_push_pending:{user_id}",))
+
+def rekey_user(user_id, old_encryption_key, new_encryption_key, new_salt, new_kdf, new_kdf_params, new_password_hash = None,
+               new_wrapped_data_key = None, progress = None):
+    """
+    Re-encrypt all of a user's logins from the old key to the new one with the restartable
+    pipeline in rekeyo, then switch the user's salt, KDF settings, optional password hash and
+    optional wrapped data key over.
+    """
+    with transaction() as cursor:
+        _remember_key_push_base(cursor, user_id)
+    start_rekey(user_id, old_encryption_key, new_encryption_key, new_salt, new_kdf, new_kdf_params, new_password_hash, new_wrapped_data_key)
+    run_rekey(user_id, old_encryption_key, new_encryption_key, progress = progress)
+    finish_rekey(user_id)
+
+def resume_rekey(user_id, master_password, progress = None):
+    """
+    Finish a re-key job interrupted by a crash or shutdown, using whichever of the
+    old or new master password the user logged in with. Returns the new encryption key.
+    """
+    job = get_rekey_job(user_id)
+    if job["new_password_hash"] is not None and check_master_password(master_password, job["new_password_hash"]):
+        new_key = derive_key(master_password, job["new_salt"], job["new_kdf"], decode_kdf_params(job["new_kdf"], job["new_kdf_params"]))
+        if job["new_wrapped_data_key"] is not None:
+            new_key = unwrap_data_key(new_key, job["new_wrapped_data_key"])
+        old_key, new_key = recover_rekey_keys(job, new_key = new_key)
+    else:
+        old_key, new_key = recover_rekey_keys(job, old_key = derive_user_key(user_id, master_password))
+
+    print('Resuming interrupted re-encryption...')
+    run_rekey(user_id, old_key, new_key, progress = progress)
+    finish_rekey(user_id)
+    return new_key
+
+def upgrade_user_key(user_id, master_password, encryption_key, progress = None):
+    """
+    Move a user to this machine's preferred KDF and to a data key. A vault with a data key
+    only has it re-sealed; an older vault gets a new data key and its logins are re-encrypted
+    with it, once. The cloud copy is flagged for push_pending_key_change().
+    Returns the key that now encrypts the user's logins.
+    """
+    salt = get_user_salt(user_id)
+    kdf, params = get_kdf_settings()
+    new_master_key = derive_key(master_password, salt, kdf, params)
+
+    if get_wrapped_data_key(user_id):
+        rewrap_data_key(user_id, encryption_key, new_master_key, salt, kdf, params)
+        print(f'Upgraded key derivation to {kdf}.')
+        return encryption_key
+
+    data_key = generate_data_key()
+    rekey_user(user_id, encryption_key, data_key, salt, kdf, params, new_wrapped_data_key = wrap_data_key(new_master_key, data_key), progress = progress)
+    print(f'Moved vault to a data key, derived with {kdf}.')
+    return data_key
+
+def missing_cloud_key_columns(cloud_user):
+    """
+    Return the CLOUD_KEY_COLUMNS absent from a Supabase users row fetched with select("*").
+    Key upgrades are skipped until the project has them.
+    """
+    return [column for column in CLOUD_KEY_COLUMNS if column not in cloud_user]
+
+def adopt_cloud_key(user_id, master_password, encryption_key, cloud_user, progress = None):
+    """
+    Bring the user's key in line with their Supabase users row, so every device shares one data key.
+    Call it with a freshly fetched row before upgrade_user_key(). When the row holds a data key this vault
+    does not use yet, it is unsealed with master_password and the row's salt and KDF settings, which are
+    taken over; logins encrypted with another key are re-encrypted with it, once.
+    A row without a data key, or one the master password cannot open, leaves the vault as it is.
+    Returns the key that now encrypts the user's logins.
+    """
+    cloud_wrapped_key = base64.b64decode(cloud_user["wrapped_key"]) if cloud_user.get("wrapped_key") else None
+    local_wrapped_key = get_wrapped_data_key(user_id)
+
+    # A key change made here against what the cloud still holds is pushed as it is
+    cloud_base = base64.b64encode(cloud_wrapped_key).decode("utf-8") if cloud_wrapped_key else ""
+    if get_config_text(f"key_push_pending:{user_id}") and get_config_text(f"key_push_base:{user_id}") == cloud_base:
+        return encryption_key
+
+    if cloud_wrapped_key is not None and cloud_wrapped_key != local_wrapped_key:
+        cloud_kdf = cloud_user.get("kdf") or LEGACY_KDF
+        cloud_salt = base64.b64decode(cloud_user["salt"])
+        cloud_params = decode_kdf_params(cloud_kdf, cloud_user.get("kdf_params"))
+        try:
+            data_key = unwrap_data_key(derive_key(master_password, cloud_salt, cloud_kdf, cloud_params), cloud_wrapped_key)
+        except InvalidTag:
+            print('The data key in Supabase is sealed with a different master password; keeping the local key.')
+            return encryption_key
+
+        if data_key == encryption_key:
+            with transaction() as cursor:
+                cursor.execute("update users set wrapped_key = ?, salt = ?, kdf = ?, kdf_params = ? where id = ?",
+                               (cloud_wrapped_key, cloud_salt, cloud_kdf, encode_kdf_params(cloud_params), user_id))
+                # The cloud already holds this key; a re-seal made here is superseded
+                cursor.execute("delete from config where key = ? and value = 'key'", (f"key_push_pending:{user_id}",))
+        else:
+            rekey_user(user_id, encryption_key, data_key, cloud_salt, cloud_kdf, cloud_params,
+                       new_wrapped_data_key = cloud_wrapped_key, progress = progress)
+            print('Adopted the data key from Supabase.')
+        encryption_key = data_key
+
+    with transaction() as cursor:
+        _remember_key_push_base(cursor, user_id, cloud_wrapped_key, replace = True)
+    return encryption_key
+
+def push_pending_key_change(user_id, supabase):
+    """
+    Upload a locally completed KDF upgrade or master password change: the user's
+    password hash, salt, KDF settings and wrapped data key, then every login if they were re-encrypted.
+    The users row is only updated while it still holds the wrapped data key the change was made against,
+    so a data key set up by another device is never overwritten; adopt_cloud_key() takes it over instead.
+    Returns True if nothing was pending or the upload finished, False if the cloud key has changed;
+    network errors propagate.
+    """
+    pending = get_config_text(f"key_push_pending:{user_id}")
+    if not pending:
+        return True
+
+    salt, kdf, params = get_user_kdf(user_id)
+    password_hash, wrapped_key = get_connection().execute("select password_hash, wrapped_key from users where id = ?", (user_id,)).fetchone()
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode("utf-8")
+    base = get_config_text(f"key_push_base:{user_id}")
+    query = supabase.schema("api").from_("users").update({
+        "password_hash": password_hash,
+        "salt": base64.b64encode(salt).decode("utf-8"),
+        "kdf": kdf,
+        "kdf_params": encode_kdf_params(params),
+        "wrapped_key": base64.b64encode(wrapped_key).decode("utf-8") if wrapped_key else None}).eq("id", user_id)
+    try:
+        response = (query.eq("wrapped_key", base) if base else query.is_("wrapped_key", "null")).execute()
+    except Exception as e:
+        if is_missing_column_error(e):
+            raise Exception(f'The Supabase users table needs the {", ".join(CLOUD_KEY_COLUMNS)} columns; run supabase_setup.sql.') from e
+        raise
+    if not response.data:
+        print('The data key in Supabase was changed by another device; it is adopted on the next online login.')
+        return False
+
+    # A retry after an interrupted login upload must match the key just written
+    with transaction() as cursor:
+        _remember_key_push_base(cursor, user_id, wrapped_key, replace = True)
+    # Only a re-key changes the logins themselves; a re-sealed data key leaves them as they are
+    if pending != "key":
+        sync_all_to_supabase(supabase)
+
+    with transaction() as cursor:
+        cursor.execute("delete from config where key in (?, ?)", (f"key_push_pending:{user_id}", f"key_push_base:{user_id}"))
+    return True
+
 def store_password(user_id, website, login_username, plain_password, category, encryption_key, top_level_domain):
     """
     Encrypt and save a new login entry under the given user.
     """
 
     website = normalize_website(website, top_level_domain)
-    encrypted_password = encrypt_password(plain_password, encryption_key).encode()
+    encrypted_password = encrypt_password(plain_password, encryption_key)
     password_id = str(uuid.uuid4())
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
 
     try:
-        cursor.execute('insert into passwords (id, user_id, website, login_username, encrypted_password, category) values(?, ?, ?, ?, ?, ?)', (password_id, user_id, website, login_username, encrypted_password, category))
-        conn.commit()
+        with transaction() as cursor:
+            cursor.execute('insert into passwords (id, user_id, website, login_username, encrypted_password, category) values(?, ?, ?, ?, ?, ?)', (password_id, user_id, website, login_username, encrypted_password, category))
+            index_websites(cursor, user_id, [website])
+            enqueue_change(cursor, password_id, "upsert")
     except sqlite3.Error as e:
         print(f"Error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-def get_login_data(user_id, encryption_key, category = None, favorite = None):
+def _login_filter(user_id, category = None, favorite = None):
     """
-    Fetch and decrypt saved logins, optionally filtering by category or favorites.
-    Each entry is returned as a tuple: (website, username, password, created_on, id, category, favorite, syncable, last_modified).
+    Build the where clause and parameters shared by get_login_data and count_logins.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    data = []
-    query = 'SELECT website, login_username, encrypted_password, created_on, id, category, favorite, syncable, last_modified FROM passwords WHERE user_id = ?'
+    query = ' WHERE user_id = ?'
     params = [user_id]
 
     if category and category != "All" and category != "Favorites":
@@ -296,19 +701,141 @@ def get_login_data(user_id, encryption_key, category = None, favorite = None):
 
     if category == "Favorites" or favorite == "True":
         query += ' AND favorite = 1'
+    return query, params
 
-    cursor.execute(query, params)
+def get_login_data(user_id, encryption_key, category = None, favorite = None, limit = None, offset = 0):
+    """
+    Fetch saved logins, optionally filtering by category or favorites.
+    Each entry is returned as a LoginRecord that indexes like the tuple
+    (website, username, password, created_on, id, category, favorite, syncable, last_modified).
+    Passwords are decrypted only when an entry's password is read.
+    Entries are ordered by website and username; pass limit and offset to fetch one page.
+    """
+    where, params = _login_filter(user_id, category, favorite)
+    query = 'SELECT website, login_username, encrypted_password, created_on, id, category, favorite, syncable, last_modified FROM passwords' + where
+    query += ' ORDER BY website, login_username, rowid'
 
-    rows = cursor.fetchall()
-    for website, login_username, encrypted_password, creation_date, password_id, category, is_favorite, is_syncable, modified in rows:
+    if limit is not None:
+        query += ' LIMIT ? OFFSET ?'
+        params += [limit, offset]
+
+    cursor = get_connection().execute(query, params)
+    return [LoginRecord(row, encryption_key) for row in cursor.fetchall()]
+
+def count_logins(user_id, category = None, favorite = None):
+    """
+    Count the logins get_login_data would return for the same filters.
+    """
+    where, params = _login_filter(user_id, category, favorite)
+    return get_connection().execute('SELECT count(*) FROM passwords' + where, params).fetchone()[0]
+
+def build_search_query(text):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix, e.g. 'git hub' -> '"git"* "hub"*'.
+    Returns None if the text has no searchable words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_logins(user_id, encryption_key, text, limit = SEARCH_LIMIT):
+    """
+    Find logins whose website, username or category has a word starting with each word of text.
+    Returns up to limit LoginRecords ordered by website and username, like get_login_data.
+    Matches are not ranked: ranking has to score every match, which is too slow on large vaults.
+    """
+    query = build_search_query(text)
+    if query is None:
+        return []
+
+    # cross join keeps the FTS index as the outer loop; otherwise SQLite may scan the user's
+    # logins and run the full-text match once per row
+    cursor = get_connection().execute("""
+    select passwords.website, passwords.login_username, passwords.encrypted_password, passwords.created_on, passwords.id,
+           passwords.category, passwords.favorite, passwords.syncable, passwords.last_modified
+    from passwords_fts cross join passwords on passwords.rowid = passwords_fts.rowid
+    where passwords_fts match ? and passwords.user_id = ? limit ?
+    """, (query, user_id, limit))
+    rows = sorted(cursor.fetchall(), key = lambda row: (row[0], row[1]))
+    return [LoginRecord(row, encryption_key) for row in rows]
+
+def get_logins_for_websites(user_id, encryption_key, websites, limit = SEARCH_LIMIT):
+    """
+    Return up to limit LoginRecords saved under any of the given websites, kept in the order
+    the websites were given (e.g. best fuzzy match first), then by username.
+    """
+    if not websites:
+        return []
+
+    placeholders = ", ".join("?" * len(websites))
+    cursor = get_connection().execute(f"""
+    select website, login_username, encrypted_password, created_on, id, category, favorite, syncable, last_modified
+    from passwords where user_id = ? and website in ({placeholders}) limit ?
+    """, (user_id, *websites, limit))
+    position = {website: index for index, website in enumerate(websites)}
+    rows = sorted(cursor.fetchall(), key = lambda row: (position[row[0]], row[1]))
+    return [LoginRecord(row, encryption_key) for row in rows]
+
+class LoginRecord:
+    """
+    A saved login whose encrypted password is decrypted on first access.
+    Supports tuple-style indexing in the order returned by get_login_data.
+    """
+    FIELDS = ("website", "login_username", "password", "created_on", "id", "category", "favorite", "syncable", "last_modified")
+    __slots__ = ("website", "login_username", "encrypted_password", "created_on", "id", "category", "favorite", "syncable", "last_modified", "_encryption_key")
+
+    def __init__(self, row, encryption_key):
+        (self.website, self.login_username, self.encrypted_password, self.created_on, self.id,
+         self.category, self.favorite, self.syncable, self.last_modified) = row
+        self._encryption_key = encryption_key
+
+    @property
+    def password(self):
+        """
+        Decrypted password, served from the short-lived cache when possible.
+        """
         try:
-            decrypted_password = decrypt_password(encrypted_password.decode(), encryption_key)
-            data.append((website, login_username, decrypted_password, creation_date, password_id, category, is_favorite, is_syncable, modified))
+            return get_cached_password(self.id, self.encrypted_password, self._encryption_key)
         except Exception as e:
-            print(f'Error decrypting password for {website}: {e}')
-            data.append((website, login_username, 'Error: Cannot decrypt', creation_date, password_id, category, is_favorite, is_syncable, modified))
-    conn.close()
-    return data
+            print(f'Error decrypting password for {self.website}: {e}')
+            return 'Error: Cannot decrypt'
+
+    def __getitem__(self, index):
+        return getattr(self, self.FIELDS[index])
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+def get_cached_password(password_id, encrypted_password, encryption_key):
+    """
+    Return the plaintext for an encrypted password, decrypting at most once per TTL window.
+    The cache holds at most PASSWORD_CACHE_SIZE entries, each for PASSWORD_CACHE_TTL seconds.
+    """
+    cache_key = (password_id, encrypted_password)
+    now = time.monotonic()
+
+    with _password_cache_lock:
+        cached = _password_cache.get(cache_key)
+        if cached and cached[0] > now:
+            _password_cache.move_to_end(cache_key)
+            return cached[1]
+
+    plain_password = decrypt_password(encrypted_password, encryption_key)
+
+    with _password_cache_lock:
+        _password_cache[cache_key] = (now + PASSWORD_CACHE_TTL, plain_password)
+        _password_cache.move_to_end(cache_key)
+        while len(_password_cache) > PASSWORD_CACHE_SIZE:
+            _password_cache.popitem(last = False)
+    return plain_password
+
+def clear_password_cache():
+    """
+    Drop every cached plaintext password. Called on logout.
+    """
+    with _password_cache_lock:
+        _password_cache.clear()
 
 def get_category(user_id, encryption_key):
     """
@@ -317,127 +844,128 @@ def get_category(user_id, encryption_key):
     if encryption_key is None:
         raise Exception('Authentication required.')
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
     categories = []
 
-    cursor.execute('select category, website from passwords where user_id = ?',  (user_id,))
+    cursor = get_connection().execute('select category, website from passwords where user_id = ?',  (user_id,))
     rows = cursor.fetchall()
     for category, website in rows:
-        decrypted_website = decrypt_password(encrypted_website, encryption_key)
         categories.append((category, website))
-    conn.close()
     return categories
 
+def get_category_summary(user_id, preview_count = 3):
+    """
+    Return {category: (login count, first preview_count websites)} for the given user.
+    Counts come from a GROUP BY over idx_passwords_user_category, and each category's previews
+    are read through the same index with a LIMIT, so no per-login rows reach Python.
+    A row_number() window would number every login of the user before filtering, which is far slower.
+    """
+    cursor = get_connection().execute("""
+    with counts as (select category, count(*) as total from passwords where user_id = ? group by category)
+    select counts.category, counts.total, passwords.website from counts
+    left join passwords on passwords.rowid in (select rowid from passwords where user_id = ? and category = counts.category order by rowid limit ?)
+    order by counts.category, passwords.rowid
+    """, (user_id, user_id, preview_count))
+
+    summary = {}
+    for category, total, website in cursor.fetchall():
+        count, websites = summary.setdefault(category, (total, []))
+        if website is not None:
+            websites.append(website)
+    return summary
+
 def delete_login(user_id, password_id):
     """
     Delete a login entry by its ID for the specified user.
     Commits immediately.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("delete from passwords where user_id = ? and id = ?", (user_id, password_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        website = cursor.execute("select website from passwords where user_id = ? and id = ?", (user_id, password_id)).fetchone()
+        enqueue_change(cursor, password_id, "delete")
+        cursor.execute("delete from passwords where user_id = ? and id = ?", (user_id, password_id,))
+        if website:
+            prune_websites(cursor, user_id, [website[0]])
 
 def edit_login(user_id, old_username, old_website, new_website, new_login_username, new_password, encryption_key):
     """
     Update an existing login's website, username, and password.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute('select id from passwords where user_id = ? and website = ? and login_username = ?', (user_id, old_website, old_username))
+    cursor = get_connection().execute('select id from passwords where user_id = ? and website = ? and login_username = ?', (user_id, old_website, old_username))
     result = cursor.fetchone()
 
     if not result:
-        conn.close()
         return False, "Login not found"
 
-    new_encrypted_password = encrypt_password(new_password, encryption_key).encode()
+    new_encrypted_password = encrypt_password(new_password, encryption_key)
 
     try:
-        cursor.execute("update passwords set website = ?, login_username = ?, encrypted_password = ?, last_modified = current_timestamp where user_id = ? and id = ?", (new_website, new_login_username, new_encrypted_password, user_id, result[0]))
-        conn.commit()
-        conn.close()
+        with transaction() as cursor:
+            cursor.execute("update passwords set website = ?, login_username = ?, encrypted_password = ?, last_modified = current_timestamp where user_id = ? and id = ?", (new_website, new_login_username, new_encrypted_password, user_id, result[0]))
+            index_websites(cursor, user_id, [new_website])
+            prune_websites(cursor, user_id, [old_website])
+            enqueue_change(cursor, result[0], "upsert")
         return True, "Login updated successfully!"
     except sqlite3.Error as e:
-        conn.rollback()
-        conn.close()
         print(f'Error Editing Login: {e}')
         return False
 
-def change_master_password(user_id, old_password, new_password, supabase):
+def change_master_password(user_id, old_password, new_password, supabase, progress = None):
     """
-    Change master password: re-encrypt all entries with a new key derived from new_password.
-    Updates both local SQLite and remote Supabase records.
+    Change master password: re-seal the vault's data key with a key derived from new_password.
+    A vault without a data key is moved to one, re-encrypting its entries once.
+    Updates both local SQLite and remote Supabase records. progress(done, total) reports re-encryption.
+    Uses the session key cache, when it holds this user's key, instead of bcrypt and the KDF.
+    Returns (success, error_message).
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('select password_hash, salt from users where id = ? ', (user_id,))
+    conn = get_connection()
+    cursor = conn.execute('select password_hash, salt from users where id = ? ', (user_id,))
     row = cursor.fetchone()
 
     if not row:
-        conn.close()
         return False, 'User not found'
 
-    if not check_master_password(old_password, row[0]):
-        conn.close()
+    cached_match = session_password_matches(user_id, old_password)
+    if cached_match is False or (cached_match is None and not check_master_password(old_password, row[0])):
         return False, 'Wrong password'
 
-    old_encryption_key = derive_key(old_password, row[1])
-
-    cursor.execute('select id, encrypted_password from passwords where user_id = ?', (user_id,))
-    logins = cursor.fetchall()
-    decrypted_passwords = {}
-
-    for login_id, encrypted_password in logins:
-        try:
-            decrypted_passwords[login_id] = decrypt_password(encrypted_password.decode(), old_encryption_key)
-        except Exception as e:
-            print(f'Error decrypting password for {login_id}: {e}')
-            conn.close()
-            return False
+    old_encryption_key = get_session_key(user_id) if cached_match else derive_user_key(user_id, old_password)
 
     new_salt = os.urandom(16)
-    new_salt_b64 = base64.b64encode(new_salt).decode("utf-8")
-    new_encryption_key = derive_key(new_password, new_salt)
-
-    for login_id, plain_password in decrypted_passwords.items():
-        new_encrypted_password = encrypt_password(plain_password, new_encryption_key)
-        cursor.execute("update passwords set encrypted_password = ? where id = ?", (new_encrypted_password, login_id))
+    new_kdf, new_kdf_params = get_kdf_settings()
+    new_master_key = derive_key(new_password, new_salt, new_kdf, new_kdf_params)
 
     new_password_bytes = hash_master_password(new_password)
-    new_password_hash = new_password_bytes.decode("utf-8")
-    cursor.execute('update users set password_hash = ?, salt = ? where id = ?', (new_password_hash, new_salt_b64, user_id))
-    conn.commit()
-    conn.close()
-
-    response = supabase.schema("api").from_("users").update({
-        "password_hash": new_password_hash,
-        "salt": new_salt_b64,}).eq("id", user_id).execute()
 
-    if response.error:
-        return False, f"Remote update failed: {response.error}"
+    try:
+        if get_wrapped_data_key(user_id):
+            rewrap_data_key(user_id, old_encryption_key, new_master_key, new_salt, new_kdf, new_kdf_params, new_password_bytes)
+        else:
+            # A vault without a data key gets one now, which re-encrypts its logins this one time
+            data_key = generate_data_key()
+            rekey_user(user_id, old_encryption_key, data_key, new_salt, new_kdf, new_kdf_params, new_password_bytes,
+                       wrap_data_key(new_master_key, data_key), progress)
+    except Exception as e:
+        print(f'Error re-encrypting logins: {e}')
+        return False, 'Unable to re-encrypt stored logins. Log in again to finish the change.'
 
-    sync_all_to_supabase(supabase)
-    set_last_synced_time()
-    supabase.auth.sign_out()
+    # The local change is committed; if Supabase is unreachable the push is retried on the next online login
+    try:
+        push_pending_key_change(user_id, supabase)
+    except Exception as e:
+        print(f'Could not push new master password to Supabase: {e}')
+    try:
+        supabase.auth.sign_out()
+    except Exception as e:
+        print(f'Could not sign out of Supabase: {e}')
 
     return True, None
 
 def delete_master_user(user_id, password):
     """
     Permanently remove a user's account and all associated data.
-    Confirms password before deletion.
+    Confirms password before deletion, using the session key cache when available.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
     try:
-        cursor.execute('select username, password_hash from users where id = ?', (user_id,))
+        cursor = get_connection().execute('select username, password_hash from users where id = ?', (user_id,))
         rows = cursor.fetchone()
         username = rows[0]
         stored_password = rows[1]
@@ -445,9 +973,13 @@ def delete_master_user(user_id, password):
         if not username:
             return False, f'User {username} not found.'
 
-        if check_master_password(password, stored_password):
-            cursor.execute('delete from users where id = ?', (user_id,))
-            conn.commit()
+        cached_match = session_password_matches(user_id, password)
+        if cached_match or (cached_match is None and check_master_password(password, stored_password)):
+            with transaction() as cursor:
+                cursor.execute('delete from users where id = ?', (user_id,))
+                cursor.execute('delete from website_trigrams where user_id = ?', (user_id,))
+                cursor.execute('delete from sessions where user_id = ?', (user_id,))
+                cursor.execute('delete from outbox where user_id = ?', (user_id,))
             print(f'User {username} deleted successfully!')
             return True
         else:
@@ -456,8 +988,6 @@ def delete_master_user(user_id, password):
     except sqlite3.Error as e:
         print(f'User Deletion Error: {e}')
         return False
-    finally:
-        conn.close()
 
 def get_login_info(username):
     """
@@ -465,12 +995,9 @@ def get_login_info(username):
     Uses config values 'max_attempts' and 'lockout_time'.
     Returns False if locked out, True otherwise.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     now = int(time.time())
-    cursor.execute("select attempts, last_attempt from login_attempts where username = ?", (username,))
+    cursor = get_connection().execute("select attempts, last_attempt from login_attempts where username = ?", (username,))
     result = cursor.fetchone()
-    conn.close()
     if result:
         if result[0] >= int(get_config_value("max_attempts")) and (now - result[1]) < get_config_value("lockout_time"):
             return False
@@ -480,35 +1007,29 @@ def reset_attempts(username):
     """
     Clear all recorded login attempts for a user, resetting lockout state.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("delete from login_attempts where username = ?", (username,))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute("delete from login_attempts where username = ?", (username,))
 
 def increment_attempts(username):
     """
     Increment failed login count and update timestamp.
     Inserts new record if none exists.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     now = int(time.time())
 
-    cursor.execute("select * from login_attempts where username = ?", (username,))
-    result = cursor.fetchone()
+    with transaction() as cursor:
+        cursor.execute("select * from login_attempts where username = ?", (username,))
+        result = cursor.fetchone()
 
-    if result:
-        cursor.execute("update login_attempts set attempts = attempts + 1, last_attempt = ? where username = ?", (now, username))
-    else:
-        cursor.execute("insert into login_attempts(username, attempts, last_attempt) values (?, ?, ?)", (username, 1, now))
-    conn.commit()
-    conn.close()
+        if result:
+            cursor.execute("update login_attempts set attempts = attempts + 1, last_attempt = ? where username = ?", (now, username))
+        else:
+            cursor.execute("insert into login_attempts(username, attempts, last_attempt) values (?, ?, ?)", (username, 1, now))
 
 def toggle_syncable(password_id, is_syncable, encryption_key):
     """
     Enable or disable cloud sync for a password entry.
+    Turning sync off only stops the entry being pushed; its cloud copy is left as it is.
     Requires valid encryption key to ensure user is authenticated.
     """
     if not encryption_key:
@@ -516,11 +1037,10 @@ def toggle_syncable(password_id, is_syncable, encryption_key):
 
     new_val = 1 if is_syncable.get() == "on" else 0
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("update passwords set syncable = ?, last_modified = current_timestamp where id = ?", (new_val, password_id))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute("update passwords set syncable = ?, last_modified = current_timestamp where id = ?", (new_val, password_id))
+        if new_val:
+            enqueue_change(cursor, password_id, "upsert")
 
 def toggle_favorite(password_id, is_favorite, encryption_key):
     """
@@ -532,11 +1052,9 @@ def toggle_favorite(password_id, is_favorite, encryption_key):
 
     new_val = 1 if is_favorite.get() == "on" else 0
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("update passwords set favorite = ? where id = ?", (new_val, password_id))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute("update passwords set favorite = ?, last_modified = current_timestamp where id = ?", (new_val, password_id))
+        enqueue_change(cursor, password_id, "upsert")
 
 def normalize_website(website, top_level_domain):
     """
@@ -1,17 +1,109 @@
+import hashlib
+import hmac
+import json
 import os
-from base64 import urlsafe_b64encode, urlsafe_b64decode
+import time
+from base64 import urlsafe_b64decode
 import bcrypt
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 
-def derive_key(master_password, salt):
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:  # cryptography < 44
+    Argon2id = None
+
+# Parameters for each supported KDF. Vaults created before KDF metadata was stored use LEGACY_KDF.
+LEGACY_KDF = "pbkdf2"
+KDF_DEFAULT_PARAMS = {
+    "pbkdf2": {"iterations": 100000},
+    "scrypt": {"n": 2 ** 15, "r": 8, "p": 1},
+    "argon2id": {"iterations": 3, "lanes": 4, "memory_cost": 65536},
+}
+
+IV_SIZE = 12
+TAG_SIZE = 16
+
+# Stored ciphertexts are raw bytes: CIPHERTEXT_VERSION | IV | tag | ciphertext. Values written before
+# the binary format are URL-safe base64 text of IV | tag | ciphertext; their first byte is always
+# printable ASCII, so it can never be mistaken for the version byte.
+CIPHERTEXT_VERSION = b"\x01"
+
+# Associated data for data keys sealed with a master-password key, so a sealed data key
+# cannot be passed off as any other wrapped value
+DATA_KEY_CONTEXT = b"cypher-data-key"
+
+# Per-process session cache: user_id -> (derived key, keyed verifier of the master password).
+# The verifier lets re-authentication skip bcrypt and the KDF; it is useless outside this process.
+_session_secret = os.urandom(32)
+_session_keys = {}
+
+# Key-bound cipher contexts, built once per key and dropped with the session
+_ciphers = {}
+
+def derive_key(master_password, salt, kdf = LEGACY_KDF, params = None):
+    """
+    Derive a 32-byte encryption key from the master password and salt
+    using the named KDF ('pbkdf2', 'scrypt' or 'argon2id') and its parameters.
     """
-    Derive a 32-byte encryption key from the master password and salt.
+    params = params or KDF_DEFAULT_PARAMS[kdf]
+
+    if kdf == "pbkdf2":
+        engine = PBKDF2HMAC(algorithm = hashes.SHA256(), length=32, salt=salt, iterations=params["iterations"])
+    elif kdf == "scrypt":
+        engine = Scrypt(salt=salt, length=32, n=params["n"], r=params["r"], p=params["p"])
+    elif kdf == "argon2id":
+        if Argon2id is None:
+            raise ValueError("Argon2id requires cryptography 44 or newer.")
+        engine = Argon2id(salt=salt, length=32, iterations=params["iterations"], lanes=params["lanes"], memory_cost=params["memory_cost"])
+    else:
+        raise ValueError(f"Unknown KDF: {kdf}")
+    return engine.derive(master_password.encode())
+
+def preferred_kdf():
+    """
+    Return the strongest KDF available in this environment.
+    """
+    return "argon2id" if Argon2id is not None else "scrypt"
+
+def calibrate_kdf(kdf, target_seconds = 0.5):
+    """
+    Pick parameters for the given KDF so one derivation takes about target_seconds on this machine.
+    Scales PBKDF2 iterations, the scrypt work factor n, or Argon2id passes over a fixed 64 MiB.
     """
+    salt = generate_salt()
+    params = dict(KDF_DEFAULT_PARAMS[kdf])
 
-    kdf = PBKDF2HMAC(algorithm = hashes.SHA256(), length=32, salt=salt, iterations=100000)
-    return kdf.derive(master_password.encode())
+    def timed(candidate):
+        start = time.perf_counter()
+        derive_key("calibration", salt, kdf, candidate)
+        return time.perf_counter() - start
+
+    elapsed = timed(params)
+    if kdf == "pbkdf2":
+        params["iterations"] = max(KDF_DEFAULT_PARAMS["pbkdf2"]["iterations"], int(params["iterations"] * target_seconds / elapsed))
+    elif kdf == "scrypt":
+        while elapsed * 2 <= target_seconds and params["n"] < 2 ** 20:
+            params["n"] *= 2
+            elapsed *= 2
+    elif kdf == "argon2id":
+        per_pass = elapsed / params["iterations"]
+        params["iterations"] = max(KDF_DEFAULT_PARAMS["argon2id"]["iterations"], int(target_seconds / per_pass))
+    return params
+
+def encode_kdf_params(params):
+    """
+    Serialize KDF parameters for storage next to the salt.
+    """
+    return json.dumps(params, sort_keys = True)
+
+def decode_kdf_params(kdf, encoded_params):
+    """
+    Parse stored KDF parameters, falling back to the defaults for vaults that never recorded any.
+    """
+    return json.loads(encoded_params) if encoded_params else dict(KDF_DEFAULT_PARAMS[kdf])
 
 def generate_salt():
     """
@@ -19,34 +111,114 @@ def generate_salt():
     """
     return os.urandom(16)
 
+class VaultCipher:
+    """
+    AES-GCM context bound to a single key, built once and reused for every value.
+    Writes the binary CIPHERTEXT_VERSION + IV + tag + ciphertext format and reads it
+    as well as the older URL-safe base64 text format.
+    """
+    def __init__(self, key):
+        self._aesgcm = AESGCM(key)
+
+    def encrypt(self, password, iv = None):
+        """
+        Encrypt one password. Returns the bytes CIPHERTEXT_VERSION + IV + tag + ciphertext.
+        """
+        iv = iv or os.urandom(IV_SIZE)
+        sealed = self._aesgcm.encrypt(iv, password.encode(), None)
+        return b"".join((CIPHERTEXT_VERSION, iv, sealed[-TAG_SIZE:], sealed[:-TAG_SIZE]))
+
+    def decrypt(self, encrypted_password):
+        """
+        Decrypt one stored value to its plaintext: binary bytes, or legacy base64 text (str or bytes).
+        """
+        if isinstance(encrypted_password, str):
+            encrypted_password = encrypted_password.encode()
+        if encrypted_password[:1] != CIPHERTEXT_VERSION:
+            encrypted_password = binary_ciphertext(encrypted_password)
+
+        iv = encrypted_password[1:1 + IV_SIZE]
+        tag = encrypted_password[1 + IV_SIZE:1 + IV_SIZE + TAG_SIZE]
+        ciphertext = encrypted_password[1 + IV_SIZE + TAG_SIZE:]
+        return self._aesgcm.decrypt(iv, ciphertext + tag, None).decode()
+
+    def encrypt_many(self, passwords):
+        """
+        Encrypt a list or iterator of passwords, drawing all IVs from a single urandom call.
+        """
+        passwords = list(passwords)
+        ivs = os.urandom(IV_SIZE * len(passwords))
+        return [self.encrypt(password, ivs[i * IV_SIZE:(i + 1) * IV_SIZE]) for i, password in enumerate(passwords)]
+
+    def decrypt_many(self, encrypted_passwords):
+        """
+        Decrypt a list or iterator of encrypted passwords. Raises on the first value that fails authentication.
+        """
+        decrypt = self.decrypt
+        return [decrypt(encrypted_password) for encrypted_password in encrypted_passwords]
+
+def get_cipher(key):
+    """
+    Return the cached VaultCipher for a key, creating it on first use.
+    """
+    cipher = _ciphers.get(key)
+    if cipher is None:
+        cipher = _ciphers[key] = VaultCipher(key)
+    return cipher
+
 def encrypt_password(password, key):
     """
     Encrypt the given password with AES-GCM using the provided key.
-    Returns raw bytes containing IV + tag + ciphertext.
+    Returns the bytes CIPHERTEXT_VERSION + IV + tag + ciphertext, stored as-is in SQLite.
     """
-    iv = os.urandom(12)
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv))
-    encryptor = cipher.encryptor()
-    ciphertext = encryptor.update(password.encode()) + encryptor.finalize()
-    return urlsafe_b64encode(iv + encryptor.tag + ciphertext).decode()
+    return get_cipher(key).encrypt(password)
 
 def decrypt_password(encrypted_password, key):
     """
-    Decrypt URL-safe base64 string containing IV + tag + ciphertext with AES-GCM.
+    Decrypt a stored ciphertext, binary or legacy base64, with AES-GCM.
     Returns the plaintext password.
     """
-    if isinstance(encrypted_password, bytes):
-        encrypted_password = encrypted_password.decode()
+    return get_cipher(key).decrypt(encrypted_password)
+
+def binary_ciphertext(legacy_value):
+    """
+    Convert a legacy URL-safe base64 IV + tag + ciphertext value (bytes) to the binary format.
+    No key is needed: the sealed bytes are the same, only their encoding changes.
+    Raises ValueError if the value is not valid base64.
+    """
+    legacy_value += b"=" * ((4 - len(legacy_value) % 4) % 4)
+    return CIPHERTEXT_VERSION + urlsafe_b64decode(legacy_value)
+
+def wrap_key(wrapping_key, key, context = b"cypher-key-wrap"):
+    """
+    Seal a raw key with another key using AES-GCM. Returns nonce + sealed key.
+    """
+    nonce = os.urandom(IV_SIZE)
+    return nonce + AESGCM(wrapping_key).encrypt(nonce, key, context)
+
+def unwrap_key(wrapping_key, wrapped_key, context = b"cypher-key-wrap"):
+    """
+    Open a key sealed by wrap_key. Raises cryptography's InvalidTag if the wrapping key is wrong.
+    """
+    return AESGCM(wrapping_key).decrypt(wrapped_key[:IV_SIZE], wrapped_key[IV_SIZE:], context)
+
+def generate_data_key():
+    """
+    Create a random 32-byte data key, the key that actually encrypts a vault's logins.
+    """
+    return os.urandom(32)
 
-    encrypted_password += "=" * ((4 - len(encrypted_password) % 4) % 4)
-    
-    encrypted_data = urlsafe_b64decode(encrypted_password.encode())
-    iv = encrypted_data[:12]
-    tag = encrypted_data[12:28]
-    ciphertext = encrypted_data[28:]
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag))
-    decryptor = cipher.decryptor()
-    return(decryptor.update(ciphertext) + decryptor.finalize()).decode()
+def wrap_data_key(master_key, data_key):
+    """
+    Seal a vault's data key with the key derived from the master password.
+    """
+    return wrap_key(master_key, data_key, DATA_KEY_CONTEXT)
+
+def unwrap_data_key(master_key, wrapped_data_key):
+    """
+    Open a data key sealed by wrap_data_key. Raises InvalidTag if the master key is wrong.
+    """
+    return unwrap_key(master_key, wrapped_data_key, DATA_KEY_CONTEXT)
 
 def hash_master_password(master_password):
     """
@@ -58,4 +230,44 @@ def check_master_password(password, hashed_password):
     """
     Verify a plaintext password against a bcrypt hashed password.
     """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode()
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+def _session_verifier(master_password):
+    return hmac.new(_session_secret, master_password.encode(), hashlib.sha256).digest()
+
+def remember_session_key(user_id, master_password, key):
+    """
+    Cache the derived key for a logged-in user with a verifier for their master password.
+    """
+    _session_keys[user_id] = (key, _session_verifier(master_password))
+
+def get_session_key(user_id):
+    """
+    Return the cached derived key for a user, or None if none is cached.
+    """
+    entry = _session_keys.get(user_id)
+    return entry[0] if entry else None
+
+def session_password_matches(user_id, master_password):
+    """
+    Check a re-entered master password against the session cache in constant time.
+    Returns True or False, or None when no key is cached and the caller must fall back to bcrypt.
+    """
+    entry = _session_keys.get(user_id)
+    if entry is None:
+        return None
+    return hmac.compare_digest(_session_verifier(master_password), entry[1])
+
+def forget_session_key(user_id = None):
+    """
+    Drop the cached key for one user, or for every user when user_id is None.
+    """
+    if user_id is None:
+        _session_keys.clear()
+        _ciphers.clear()
+    else:
+        entry = _session_keys.pop(user_id, None)
+        if entry:
+            _ciphers.pop(entry[0], None)
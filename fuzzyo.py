@@ -0,0 +1,97 @@
+import re
+from difflib import SequenceMatcher
+from urllib.parse import urlparse
+from connectiono import get_connection
+
+# Websites pulled from the trigram index per lookup, and the lowest score still reported as a match
+FUZZY_CANDIDATES = 50
+FUZZY_MIN_SCORE = 0.65
+
+def website_key(website):
+    """
+    Reduce a website to the part people actually type: lowercased, without scheme, "www."
+    or a short top-level domain. 'https://www.GitHub.com' -> 'github', 'mail.google.com' -> 'mail.google'.
+    """
+    parsed_url = urlparse(website)
+    domain = (parsed_url.netloc if parsed_url.netloc else website).lower().replace("www.", "")
+    name, dot, top_level_domain = domain.rpartition(".")
+    if dot and name and len(top_level_domain) <= 3:
+        return name
+    return domain
+
+def trigrams(text):
+    """
+    Return the set of padded trigrams of each word in text, in the style of pg_trgm:
+    'git' -> {'  g', ' gi', 'git', 'it '}. Padding lets short words and word starts match.
+    """
+    grams = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def index_websites(cursor, user_id, websites):
+    """
+    Add websites to the trigram index inside the caller's transaction. Already indexed websites are skipped.
+    """
+    cursor.executemany("insert or ignore into website_trigrams (user_id, trigram, website) values (?, ?, ?)",
+                       [(user_id, gram, website) for website in set(websites) for gram in trigrams(website_key(website))])
+
+def prune_websites(cursor, user_id, websites):
+    """
+    Drop websites from the trigram index once the user has no login left for them.
+    """
+    cursor.executemany("""delete from website_trigrams where user_id = ? and website = ?
+                          and not exists (select 1 from passwords where user_id = ? and website = ?)""",
+                       [(user_id, website, user_id, website) for website in set(websites)])
+
+def rebuild_website_index(cursor):
+    """
+    Re-create the trigram index from every website in the passwords table.
+    """
+    cursor.execute("delete from website_trigrams")
+    websites = {}
+    for user_id, website in cursor.execute("select distinct user_id, website from passwords").fetchall():
+        websites.setdefault(user_id, []).append(website)
+    for user_id, user_websites in websites.items():
+        index_websites(cursor, user_id, user_websites)
+
+def score_website(key, website):
+    """
+    Similarity between a typed key and a saved website, from 0 to 1. Based on difflib's ratio,
+    which tolerates swapped letters, with a floor for plain substring matches so quick-find
+    on a few letters works.
+    """
+    saved_key = website_key(website)
+    score = SequenceMatcher(None, key, saved_key).ratio()
+    if key in saved_key:
+        score = max(score, 0.8)
+    return score
+
+def find_similar_websites(user_id, text, limit = 10, min_score = FUZZY_MIN_SCORE):
+    """
+    Return up to limit (website, score) pairs for the user's saved websites that look like text,
+    best match first. Candidates come from the trigram index, so a lookup reads the index
+    entries for the typed trigrams rather than every login.
+    """
+    key = website_key(text.strip())
+    grams = trigrams(key)
+    if not grams:
+        return []
+
+    # "+website" stops SQLite grouping through the (user_id, website) index, which would read
+    # every trigram the user has instead of only the typed ones. Websites whose logins were
+    # changed by a sync may linger in the index, so candidates are checked against passwords.
+    placeholders = ", ".join("?" * len(grams))
+    cursor = get_connection().execute(f"""
+    select website from (
+    select website from website_trigrams
+    where user_id = ? and trigram in ({placeholders})
+    group by +website order by count(*) desc limit ?) as candidates
+    where exists (select 1 from passwords where passwords.user_id = ? and passwords.website = candidates.website)
+    """, (user_id, *grams, FUZZY_CANDIDATES, user_id))
+
+    matches = [(website, score_website(key, website)) for (website,) in cursor.fetchall()]
+    matches = [match for match in matches if match[1] >= min_score]
+    matches.sort(key = lambda match: match[1], reverse = True)
+    return matches[:limit]
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from connectiono import get_connection, transaction
+from dbo import normalize_website
+from encryptiono import get_cipher
+from fuzzyo import index_websites
+from outboxo import enqueue_changes
+
+# Entries encrypted and committed per transaction, and threads sharing the AES-GCM work of each batch
+IMPORT_BATCH_SIZE = 2000
+IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Folders and groups that name one of these become the login's category; anything else lands in the default
+IMPORT_CATEGORIES = ("Websites", "Banks", "Games", "Work", "Socials", "Email", "Shopping", "Personal", "Other")
+IMPORT_DEFAULT_CATEGORY = "Websites"
+
+# Column names (lowercased) of each supported CSV export. website lists candidates in order of preference;
+# a format is recognized when its header has every column named here. Chrome's header also covers Edge and
+# Brave; Firefox's is checked after Chrome's because it is a subset of it.
+CSV_FORMATS = (
+    ("Bitwarden", {"website": ("login_uri", "name"), "login_username": "login_username", "password": "login_password",
+                   "folder": "folder", "favorite": "favorite", "type": "type"}),
+    ("KeePass", {"website": ("url", "title"), "login_username": "username", "password": "password", "folder": "group"}),
+    ("Chrome", {"website": ("url", "name"), "login_username": "username", "password": "password"}),
+    ("Firefox", {"website": ("url",), "login_username": "username", "password": "password"}),
+)
+
+def detect_csv_format(header):
+    """
+    Return (name, columns) of the CSV export whose columns all appear in header, or raise ValueError.
+    """
+    header = {column.strip().lower() for column in header if column}
+    for name, columns in CSV_FORMATS:
+        required = set(columns["website"]) | {column for key, column in columns.items() if key != "website"}
+        if required <= header:
+            return name, columns
+    raise ValueError("Unrecognized export: expected a Chrome, Firefox, Bitwarden or KeePass CSV file.")
+
+def map_category(folder):
+    """
+    Map an export's folder or group path (e.g. "Root/Banks") onto one of the app's categories.
+    """
+    name = (folder or "").replace("\\", "/").rstrip("/").rsplit("/", 1)[-1].strip().lower()
+    for category in IMPORT_CATEGORIES:
+        if category.lower() == name:
+            return category
+    return IMPORT_DEFAULT_CATEGORY
+
+def _entry_from_record(record, columns):
+    """
+    Turn one export record with lowercased keys into (website, login_username, password, category, favorite),
+    or None if it is not a login or has no password.
+    """
+    if "type" in columns and (record.get(columns["type"]) or "login").strip().lower() != "login":
+        return None
+
+    password = record.get(columns["password"]) or ""
+    website = next((record[column].strip() for column in columns["website"] if (record.get(column) or "").strip()), "")
+    if not password or not website:
+        return None
+
+    favorite = 1 if "favorite" in columns and str(record.get(columns["favorite"]) or "").strip().lower() in ("1", "true") else 0
+    return website, (record.get(columns["login_username"]) or "").strip(), password, map_category(record.get(columns.get("folder"))), favorite
+
+def read_csv_export(raw_file):
+    """
+    Stream login entries from a CSV export opened in binary mode, one row at a time.
+    Raises ValueError if the header matches no known format.
+    """
+    text_file = io.TextIOWrapper(raw_file, encoding = "utf-8-sig", newline = "")
+    try:
+        reader = csv.reader(text_file)
+        header = [column.strip().lower() for column in next(reader, [])]
+        _, columns = detect_csv_format(header)
+
+        for row in reader:
+            entry = _entry_from_record(dict(zip(header, row)), columns)
+            if entry:
+                yield entry
+    finally:
+        # Leave raw_file open for the caller, who still reads its position for progress
+        text_file.detach()
+
+def read_json_export(raw_file):
+    """
+    Yield login entries from an unencrypted Bitwarden JSON export, or from a JSON list of objects
+    with the columns of one of the CSV formats. The document is parsed in one piece;
+    entries are still handed on one at a time.
+    """
+    data = json.load(raw_file)
+
+    if isinstance(data, dict):
+        if data.get("encrypted"):
+            raise ValueError("This Bitwarden export is encrypted. Export it again as unencrypted JSON.")
+        folders = {folder.get("id"): folder.get("name") for folder in data.get("folders") or []}
+        for item in data.get("items") or []:
+            login = item.get("login") or {}
+            # Bitwarden item type 1 is a login; notes, cards and identities are skipped
+            if item.get("type") != 1 or not login.get("password"):
+                continue
+            uris = [uri.get("uri") for uri in login.get("uris") or [] if uri.get("uri")]
+            website = (uris[0] if uris else item.get("name") or "").strip()
+            if website:
+                yield (website, (login.get("username") or "").strip(), login["password"],
+                       map_category(folders.get(item.get("folderId"))), 1 if item.get("favorite") else 0)
+        return
+
+    if not isinstance(data, list) or not data:
+        raise ValueError("Unrecognized export: expected a Bitwarden JSON file or a list of logins.")
+
+    _, columns = detect_csv_format(data[0].keys())
+    for record in data:
+        entry = _entry_from_record({str(key).lower(): "" if value is None else str(value) for key, value in record.items()}, columns)
+        if entry:
+            yield entry
+
+def _batches(entries, batch_size):
+    """
+    Group an iterator of entries into lists of up to batch_size.
+    """
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_entries(user_id, entries, encryption_key, top_level_domain = ".com", batch_size = IMPORT_BATCH_SIZE, workers = IMPORT_WORKERS, on_batch = None):
+    """
+    Store an iterator of (website, login_username, password, category, favorite) entries in the user's vault.
+    Entries are encrypted batch by batch across a thread pool and written with executemany,
+    one transaction per batch together with their search index and outbox entries.
+    Logins whose website and username already exist in the vault, or earlier in the stream, are skipped,
+    so an interrupted import can simply be run again.
+    Calls on_batch() after each batch. Returns (imported, skipped).
+    """
+    cipher = get_cipher(encryption_key)
+    seen = set(get_connection().execute("select website, login_username from passwords where user_id = ?", (user_id,)).fetchall())
+    slice_size = max(1, -(-batch_size // workers))
+    imported = skipped = 0
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        for batch in _batches(entries, batch_size):
+            new_entries = []
+            for website, login_username, password, category, favorite in batch:
+                website = normalize_website(website, top_level_domain)
+                if (website, login_username) in seen:
+                    skipped += 1
+                    continue
+                seen.add((website, login_username))
+                new_entries.append((website, login_username, password, category, favorite))
+
+            if new_entries:
+                slices = [[entry[2] for entry in new_entries[i:i + slice_size]] for i in range(0, len(new_entries), slice_size)]
+                encrypted_passwords = [value for part in pool.map(cipher.encrypt_many, slices) for value in part]
+                rows = [(str(uuid.uuid4()), user_id, website, login_username, encrypted_password, category, favorite)
+                        for (website, login_username, _, category, favorite), encrypted_password in zip(new_entries, encrypted_passwords)]
+
+                with transaction() as cursor:
+                    cursor.executemany("""insert into passwords (id, user_id, website, login_username, encrypted_password, category, favorite)
+                                          values (?, ?, ?, ?, ?, ?, ?)""", rows)
+                    index_websites(cursor, user_id, [row[2] for row in rows])
+                    enqueue_changes(cursor, [row[0] for row in rows], "upsert")
+                imported += len(rows)
+
+            if on_batch:
+                on_batch()
+
+    return imported, skipped
+
+def import_logins(user_id, path, encryption_key, top_level_domain = ".com", progress = None):
+    """
+    Import a Chrome, Firefox, Bitwarden or KeePass export (.csv, or .json for Bitwarden) into the user's vault,
+    reading the file as a stream and storing it with import_entries().
+    Calls progress(bytes_read, file_size) after each batch. Returns (imported, skipped).
+    """
+    file_size = os.path.getsize(path) or 1
+
+    with open(path, "rb") as raw_file:
+        entries = read_json_export(raw_file) if path.lower().endswith(".json") else read_csv_export(raw_file)
+        report = (lambda: progress(min(raw_file.tell(), file_size), file_size)) if progress else None
+        return import_entries(user_id, entries, encryption_key, top_level_domain, on_batch = report)
@@ -1,23 +1,46 @@
+from startupo import mark
 import base64
 import customtkinter as ctk
-from tkinter import messagebox
-from supabase import create_client
-from dbo import (create_user, verify_user, get_login_data, store_password, database_exists,
+from tkinter import messagebox, filedialog
+mark("customtkinter imported")
+from dbo import (create_user, verify_user, get_login_data, store_password, database_exists, migrate_database,
                  delete_login, init_database, change_master_password, backup_database, load_theme_preference,
                  save_theme_preference, load_appear_preference, save_appear_preference,
-                 save_username, load_username, delete_master_user, edit_login, get_user_salt, reset_attempts,
-                 get_category, get_login_info, increment_attempts, user_exists, toggle_favorite, toggle_syncable)
-from pwhandlero import password_strength, gen_set_password, toggle_password_visibility, copy_to_clipboard
-from encryptiono import derive_key
+                 save_username, load_username, delete_master_user, edit_login, reset_attempts,
+                 get_category_summary, get_login_info, increment_attempts, user_exists, toggle_favorite, toggle_syncable,
+                 clear_password_cache, get_config_value, derive_user_key, user_needs_key_upgrade, upgrade_user_key,
+                 adopt_cloud_key, missing_cloud_key_columns, push_pending_key_change, resume_rekey, count_logins, search_logins, get_logins_for_websites,
+                 normalize_website, SEARCH_LIMIT)
+mark("dbo imported")
+from pwhandlero import (bind_strength_meter, gen_set_password, toggle_password_visibility, copy_to_clipboard, generate_passwords,
+                        generate_passphrases, export_passwords_csv, BULK_GENERATE_COUNT)
+from encryptiono import remember_session_key, forget_session_key, LEGACY_KDF
 from supacloud import (get_supabase_user_by_id, sync_from_supabase, sync_modified_rows_to_supabase,
-                       insert_user_into_table, supabase_login, supabase_register, sync_all_to_supabase)
+                       insert_user_into_table, supabase_login, supabase_register, sync_all_to_supabase, LazySupabaseClient,
+                       save_session, has_saved_session, resume_session, watch_session, unwatch_session)
+from workero import BackgroundWorker
+from virtuallisto import VirtualList, PagedRows
+from screenso import ScreenManager
+from rekeyo import get_rekey_job
+from fuzzyo import find_similar_websites
+from outboxo import OutboxDrainer, count_pending_changes
+from importo import import_logins
+from archiveo import export_archive, restore_archive, ARCHIVE_EXTENSION
+from backupo import BackupScheduler, restore_backup, get_backup_dir, BACKUP_SUFFIX
+mark("app modules imported")
 
 # Initialize or set up the database on startup
 if database_exists():
     print('Database initialized! Continuing...')
+    migrate_database()
 else:
     print('Database not initialized or corrupted. Running setup...')
     init_database()
+mark("database ready")
+
+# Rotated backups are written in the background while the app is open
+backup_scheduler = BackupScheduler()
+backup_scheduler.start()
 
 # load custom button colors
 user_theme = load_theme_preference()
@@ -26,14 +49,26 @@ ctk.set_default_color_theme(user_theme)
 # load custom user theme
 user_appear = load_appear_preference()
 ctk.set_appearance_mode(user_appear)
+mark("preferences loaded")
 
 SUPABASE_URL = "..."
 SUPABASE_KEY = "..."
-supaclient = create_client(SUPABASE_URL, SUPABASE_KEY)
+# The client (and the supabase/httpx imports behind it) is only created by the first network operation
+supaclient = LazySupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
 app = ctk.CTk()
 app.geometry("410x550")
 app.title("Cypher")
+mark("main window created")
+
+# Runs cloud sync jobs off the Tk thread, one at a time
+sync_worker = BackgroundWorker(app, "cypher-sync")
+
+# Runs login and master password changes (bcrypt, KDF, re-encryption) off the Tk thread
+auth_worker = BackgroundWorker(app, "cypher-auth")
+
+# Pause after the last keystroke before the sidebar search runs
+SEARCH_DELAY_MS = 150
 
 # Clears all widgets from the tkinter container
 def clear_screen(name):
@@ -123,6 +158,9 @@ def login_screen():
                  text_color=("#999999", "#777777"),
                  pady = 5).pack()
 
+    # Indeterminate progress bar shown while credentials are checked in the background
+    login_progress = ctk.CTkProgressBar(login_card, mode = "indeterminate", width = 200)
+
     # Attempts login locally and via Supabase, handles session setup
     def attempt_login():
         username = username_entry.get().strip()
@@ -139,49 +177,152 @@ def login_screen():
                 messagebox.showerror("Too many attempts", "Your account is temporarily locked. Please try again later.")
                 return
 
+        # bcrypt, the KDF and the Supabase round trips all run on the auth worker
+        if not auth_worker.submit(lambda progress: login_job(username, password, user_known),
+                                  on_done = lambda result: finish_login(username, password, user_known, result),
+                                  on_error = lambda error: finish_login(username, password, user_known, {"error": str(error)})):
+            return
+
+        login_button.configure(state = "disabled", text = "Unlocking...")
+        login_progress.pack(pady = (0, 10))
+        login_progress.start()
+
+    # Runs on the auth worker: verifies credentials, signs in to Supabase if needed and derives the key
+    def login_job(username, password, user_known):
+        warnings = []
+        online = False
+        session = None
         user_id = verify_user(username, password) if user_known else None
 
-        # Always attempt Supabase login to restore session for syncing
-        try:
-            response = supabase_login(username, password, supaclient)
-            if not response or "user_id" not in response:
-                raise Exception("Supabase login failed")
+        # With a stored session a local unlock needs no network; resume_cloud_job refreshes it afterwards.
+        # A vault due for a key upgrade signs in first, since the upgrade has to see the cloud users row
+        resume = bool(user_id) and has_saved_session(user_id) and not user_needs_key_upgrade(user_id)
 
-            # Set the Supabase session so sync operations can be performed
-            supaclient.auth.set_session(response["session"].access_token, response["session"].refresh_token)
+        if not resume:
+            try:
+                response = supabase_login(username, password, supaclient)
+                if not response or "user_id" not in response:
+                    raise Exception("Supabase login failed")
 
-            # If local login failed, but Supabase login succeeded, fetch/create user locally
-            if not user_id:
-                supabase_user_id = response["user_id"]
-                user_data = get_supabase_user_by_id(supabase_user_id, supaclient)
+                # Set the Supabase session so sync operations can be performed
+                session = response["session"]
+                supaclient.auth.set_session(session.access_token, session.refresh_token)
+                online = True
 
-                if not user_data:
-                    insert_user_into_table(supabase_user_id, username, password, supaclient)
+                # If local login failed, but Supabase login succeeded, fetch/create user locally
+                if not user_id:
+                    supabase_user_id = response["user_id"]
                     user_data = get_supabase_user_by_id(supabase_user_id, supaclient)
+
                     if not user_data:
-                        raise Exception("Failed to retrieve user data after insertion")
+                        insert_user_into_table(supabase_user_id, username, password, supaclient)
+                        user_data = get_supabase_user_by_id(supabase_user_id, supaclient)
+                        if not user_data:
+                            raise Exception("Failed to retrieve user data after insertion")
+
+                    # Register user locally
+                    salt = base64.b64decode(user_data["salt"])
+                    wrapped_key = base64.b64decode(user_data["wrapped_key"]) if user_data.get("wrapped_key") else None
+                    create_user(user_data["username"], password, user_data["id"], salt, user_data.get("kdf") or LEGACY_KDF, user_data.get("kdf_params"), wrapped_key)
+                    import httpx
+                    try:
+                        sync_from_supabase(user_data["id"], supaclient)
+                    except httpx.TransportError:
+                        warnings.append(("No Internet Connection", "Could not reach Supabase. Your logins will download on the next sync."))
+                    user_id = verify_user(username, password)
+
+            except Exception as e:
+                if not user_id:
+                    return {"error": f"Supabase login failed:\n{e}"}
+                else:
+                    warnings.append(("Warning", f"Supabase login failed but local login succeeded:\nProceeding in offline mode."))
 
-                # Register user locally
-                salt = base64.b64decode(user_data["salt"])
-                create_user(user_data["username"], password, user_data["id"], salt)
-                sync_from_supabase(user_data["id"], supaclient)
-                user_id = verify_user(username, password)
+        if not user_id:
+            return {"user_id": None, "encryption_key": None, "warnings": warnings}
 
+        # Finish a re-encryption that was interrupted before deriving anything else
+        if get_rekey_job(user_id):
+            encryption_key = resume_rekey(user_id, password)
+        else:
+            encryption_key = derive_user_key(user_id, password)
+
+        # Every device uses the data key in the cloud users row, so it is checked before anything is upgraded
+        cloud_checked = False
+        if online:
+            cloud_user = get_supabase_user_by_id(user_id, supaclient)
+            missing_columns = missing_cloud_key_columns(cloud_user) if cloud_user else []
+            if missing_columns:
+                warnings.append(("Supabase Setup", f"The Supabase users table has no {', '.join(missing_columns)} column.\n"
+                                                   "Run supabase_setup.sql in your project; key upgrades wait until then."))
+            elif cloud_user:
+                encryption_key = adopt_cloud_key(user_id, password, encryption_key, cloud_user)
+                cloud_checked = True
+
+        # Existing vaults move to a data key and the preferred KDF transparently on their next online login,
+        # unless another device already did and its settings were adopted above
+        if cloud_checked and user_needs_key_upgrade(user_id):
+            encryption_key = upgrade_user_key(user_id, password, encryption_key)
+        if online:
+            save_session(user_id, session, encryption_key)
+            watch_session(user_id, encryption_key, supaclient)
+            try:
+                push_pending_key_change(user_id, supaclient)
+            except Exception as e:
+                print(f'Could not upload key settings to Supabase: {e}')
+
+        return {"user_id": user_id, "encryption_key": encryption_key, "warnings": warnings, "resume": resume, "online": online}
+
+    # Runs on the sync worker after a local unlock: brings cloud sync online with the stored session,
+    # falling back to a password sign-in if Supabase no longer accepts it
+    def resume_cloud_job(user_id, username, password, encryption_key):
+        if not resume_session(user_id, encryption_key, supaclient):
+            response = supabase_login(username, password, supaclient)
+            if not response:
+                raise Exception("Supabase login failed")
+            save_session(user_id, response["session"], encryption_key)
+        watch_session(user_id, encryption_key, supaclient)
+        try:
+            push_pending_key_change(user_id, supaclient)
         except Exception as e:
-            if not user_id:
-                messagebox.showerror("Error", f"Supabase login failed:\n{e}")
-                return
-            else:
-                messagebox.showwarning("Warning", f"Supabase login failed but local login succeeded:\nProceeding in offline mode.")
+            print(f'Could not upload key settings to Supabase: {e}')
+
+    def finish_resume_cloud(error):
+        print(f'Could not reconnect to Supabase: {error}')
+        messagebox.showwarning("Warning", "Could not reconnect to Supabase.\nProceeding in offline mode; sync will retry on the next unlock.")
+
+    # Back on the Tk thread: report the outcome and open the vault
+    def finish_login(username, password, user_known, result):
+        if not login_button.winfo_exists():
+            return
+        login_progress.stop()
+        login_progress.pack_forget()
+        login_button.configure(state = "normal", text = "Log In")
 
+        if "error" in result:
+            messagebox.showerror("Error", result["error"])
+            return
+
+        for title, message in result["warnings"]:
+            messagebox.showwarning(title, message)
+
+        user_id = result["user_id"]
         if user_id:
             reset_attempts(username)
-            salt = get_user_salt(user_id)
-            encryption_key = derive_key(password, salt)
+            encryption_key = result["encryption_key"]
+            if get_config_value("session_key_cache"):
+                remember_session_key(user_id, password, encryption_key)
             save_username(remember_var, username)
             password_entry.delete(0, "end")
             app.withdraw()
+            token = new_session_token()
             cypher(user_id, encryption_key, supaclient)
+            if result["online"]:
+                start_outbox(user_id)
+            elif result["resume"]:
+                # The reconnect can finish after a logout; the drainer only starts if this session is still open
+                sync_worker.submit(lambda progress: resume_cloud_job(user_id, username, password, encryption_key),
+                                   on_done = lambda result: start_outbox(user_id) if token == session_token else None,
+                                   on_error = finish_resume_cloud)
         else:
             if user_known:
                 increment_attempts(username)
@@ -283,7 +424,7 @@ def register_screen():
     strength_label = ctk.CTkLabel(strength_bar_frame, text = "Weak", text_color = "red", font = ("Tahoma", 12))
     strength_label.pack(side = "left", padx = 10)
 
-    password_entry.bind("<KeyRelease>", lambda event: password_strength(password_var.get(), strength_label, strength_bar))
+    bind_strength_meter(password_entry, password_var, strength_label, strength_bar)
 
     # Register button
     register_button_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
@@ -352,28 +493,32 @@ def cypher(user_id: int, encryption_key, supabase):
 
     ctk.CTkLabel(sidebar, text = "Cypher", font = ("Tahoma", 19, "bold")).pack(pady = 10)
 
+    search_entry = ctk.CTkEntry(sidebar, width = 120, height = 32, corner_radius = 6, placeholder_text = "Search", border_color = "#3C3C3C", fg_color = "#1F1F1F")
+    search_entry.pack(pady = (0, 5))
+    search_entry.bind("<KeyRelease>", lambda event: schedule_search())
+
     passwords_label = ctk.CTkLabel(sidebar, text = "Passwords", font = ("Tahoma", 12, "bold"), anchor = "w")
     passwords_label.pack(fill = "x", pady=(10,0))
 
-    logins_btn = ctk.CTkButton(sidebar, text = "Categories", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_categories_screen(content_frame))
+    logins_btn = ctk.CTkButton(sidebar, text = "Categories", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show("categories"))
     logins_btn.pack(pady = 5)
 
-    all_btn = ctk.CTkButton(sidebar, text = "All Logins", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_category(content_frame, user_id, "All"))
+    all_btn = ctk.CTkButton(sidebar, text = "All Logins", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_category("All"))
     all_btn.pack(pady = 5)
 
-    fav_btn = ctk.CTkButton(sidebar, text = "Favorites", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_category(content_frame, user_id, "Favorites", "True"))
+    fav_btn = ctk.CTkButton(sidebar, text = "Favorites", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_category("Favorites", "True"))
     fav_btn.pack(pady = (5,10))
 
     tools_label = ctk.CTkLabel(sidebar, text = "Tools", font = ("Tahoma", 12, "bold"), anchor = "w")
     tools_label.pack(fill = "x", pady=(10,0))
 
-    gen_btn = ctk.CTkButton(sidebar, text = "Generator", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: generator_screen(content_frame))
+    gen_btn = ctk.CTkButton(sidebar, text = "Generator", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show("generator"))
     gen_btn.pack(pady = 5)
 
-    new_login_btn = ctk.CTkButton(sidebar, text = "Add a login", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_add_login(user_id, content_frame))
+    new_login_btn = ctk.CTkButton(sidebar, text = "Add a login", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show("add_login"))
     new_login_btn.pack(pady = 5)
 
-    cloud_btn = ctk.CTkButton(sidebar, text = "Sync", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: show_cloud_screen(content_frame))
+    cloud_btn = ctk.CTkButton(sidebar, text = "Sync", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show("cloud"))
     cloud_btn.pack(pady = 5)
 
     ctk.CTkLabel(
@@ -389,43 +534,50 @@ def cypher(user_id: int, encryption_key, supabase):
     logout_btn = ctk.CTkButton(bottom_frame, text = "🔓", font = ('Arial', 20), width = 40, height = 40, fg_color = 'transparent', hover_color = 'gray', command = lambda: logout(manager_win))
     logout_btn.pack(side = "left", padx = 5)
 
-    settings_btn = ctk.CTkButton(bottom_frame, text = '⚙️', font = ('Arial', 15), width = 40, height = 40, fg_color = 'transparent', hover_color = 'gray', command = lambda: open_settings(content_frame))
+    settings_btn = ctk.CTkButton(bottom_frame, text = '⚙️', font = ('Arial', 15), width = 40, height = 40, fg_color = 'transparent', hover_color = 'gray', command = lambda: screens.show("settings"))
     settings_btn.pack(side = 'left', padx = 5)
 
     content_frame = ctk.CTkFrame(manager_win, fg_color= "transparent")
     content_frame.pack(side = "right", expand = True, fill = "both")
 
-    welcome_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
-    welcome_frame.pack(expand=True, fill="both")
+    # Each sidebar screen is built once and then only shown, hidden and refreshed
+    screens = ScreenManager(content_frame)
+
+    pending_search = {"job": None}
+
+    # Runs the search once typing pauses, so fast typing costs one query instead of one per key
+    def schedule_search():
+        if pending_search["job"]:
+            manager_win.after_cancel(pending_search["job"])
+        pending_search["job"] = manager_win.after(SEARCH_DELAY_MS, run_search)
+
+    def run_search():
+        pending_search["job"] = None
+        text = search_entry.get().strip()
+        if text:
+            screens.show("search", text)
+        elif screens.current == "search":
+            show_category("All")
 
-    ctk.CTkLabel(welcome_frame, text="Welcome to Cypher!", font=("Tahoma", 20, "bold")).pack(pady=20)
-    ctk.CTkLabel(welcome_frame, text = "Choose a category from the sidebar to get started.").pack()
+    def welcome_screen(frame):
+        ctk.CTkLabel(frame, text="Welcome to Cypher!", font=("Tahoma", 20, "bold")).pack(pady=20)
+        ctk.CTkLabel(frame, text = "Choose a category from the sidebar to get started.").pack()
 
-    # Shows a grid of available categories with counts of saved logins
+    # Shows a grid of available categories with counts of saved logins.
+    # The cards are built once; refresh() only updates their counts and service names.
     def show_categories_screen(frame):
-        clear_screen(frame)
-        login_names = get_category(user_id, encryption_key)
         categories = [
-            {"name": "Websites", "count": 0, "color": "red", "services": []},
-            {"name": "Games", "count": 0, "color": "green", "services": []},
-            {"name": "Banks", "count": 0, "color": "blue", "services": []},
-            {"name": "Work", "count": 0, "color": "purple", "services": []},
-            {"name": "Socials", "count": 0, "color": "#2196F3", "services": []},
-            {"name": "Email", "count": 0, "color": "orange", "services": []},
-            {"name": "Shopping", "count": 0, "color": "#6628aa", "services": []},
-            {"name": "Personal", "count": 0, "color": "#FF00A5", "services": []},
-            {"name": "Other", "count": 0, "color": "#795548", "services": []}
+            {"name": "Websites", "color": "red"},
+            {"name": "Games", "color": "green"},
+            {"name": "Banks", "color": "blue"},
+            {"name": "Work", "color": "purple"},
+            {"name": "Socials", "color": "#2196F3"},
+            {"name": "Email", "color": "orange"},
+            {"name": "Shopping", "color": "#6628aa"},
+            {"name": "Personal", "color": "#FF00A5"},
+            {"name": "Other", "color": "#795548"}
         ]
 
-        for category_name, website in login_names:
-            for category in categories:
-                if category["name"] == category_name:
-                    category["services"].append(website)
-                    break
-
-        for category in categories:
-            category["count"] = len(category["services"])
-
         # Main container
         main_frame = ctk.CTkFrame(frame, fg_color="transparent")
         main_frame.pack(fill="both", expand=True)
@@ -466,7 +618,7 @@ def cypher(user_id: int, encryption_key, supabase):
                 border_width=0
             )
             card_frame.grid(row=row, column=col, padx=8, pady=8, sticky="nsew")
-            card_frame.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+            card_frame.bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
 
             color_bar = ctk.CTkFrame(
                 card_frame,
@@ -476,7 +628,7 @@ def cypher(user_id: int, encryption_key, supabase):
             )
             color_bar.pack(fill="x", padx=8, pady=(5, 0))
 
-            color_bar.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+            color_bar.bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
 
             name_label = ctk.CTkLabel(
                 card_frame,
@@ -486,53 +638,76 @@ def cypher(user_id: int, encryption_key, supabase):
             )
             name_label.pack(fill="x", padx=12, pady=(12, 2))
 
-            name_label.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+            name_label.bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
 
-            count_label = ctk.CTkLabel(
+            category["count_label"] = ctk.CTkLabel(
                 card_frame,
-                text=f"{category['count']} passwords",
+                text="0 passwords",
                 font=("Tahoma", 12),
                 text_color=("#666666", "#AAAAAA"),
                 anchor="w"
             )
-            count_label.pack(fill="x", padx=12, pady=(0, 5))
+            category["count_label"].pack(fill="x", padx=12, pady=(0, 5))
 
-            count_label.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+            category["count_label"].bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
 
-            # service list, shows max of 3
-            services_shown = min(3, len(category["services"]))
+            # service list, shows max of 3. Rows are hidden with grid_remove so they keep their place.
             services_frame = ctk.CTkFrame(card_frame, fg_color="transparent")
             services_frame.pack(fill="x", padx=12, pady=(0, 15))
+            services_frame.grid_columnconfigure(0, weight=1)
 
-            services_frame.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+            services_frame.bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
 
-            for j in range(services_shown):
-                service_name = category["services"][j]
+            category["service_labels"] = []
+            for j in range(3):
                 service_label = ctk.CTkLabel(
                     services_frame,
-                    text=f"• {service_name}",
+                    text="",
                     font=("Tahoma", 12),
                     text_color=("#555555", "#BBBBBB"),
                     anchor="w"
                 )
-                service_label.pack(fill="x", pady=1)
+                service_label.grid(row=j, column=0, sticky="ew", pady=1)
+                service_label.grid_remove()
 
-                service_label.bind("<Button-1>", lambda e, name=category["name"]: show_category(frame, user_id, name))
+                service_label.bind("<Button-1>", lambda e, name=category["name"]: show_category(name))
+                category["service_labels"].append(service_label)
 
             # show more indicator. shows 3, subtracts 3 from total.
-            if len(category["services"]) > 3:
-                more_label = ctk.CTkLabel(
-                    services_frame,
-                    text=f"+ {len(category['services']) - 3} more...",
-                    font=("Tahoma", 12, "italic"),
-                    text_color=("#777777", "#999999"),
-                    anchor="w"
-                )
-                more_label.pack(fill="x", pady=(4, 0))
+            category["more_label"] = ctk.CTkLabel(
+                services_frame,
+                text="",
+                font=("Tahoma", 12, "italic"),
+                text_color=("#777777", "#999999"),
+                anchor="w"
+            )
+            category["more_label"].grid(row=3, column=0, sticky="ew", pady=(4, 0))
+            category["more_label"].grid_remove()
+
+        def refresh():
+            summary = get_category_summary(user_id)
+
+            for category in categories:
+                count, websites = summary.get(category["name"], (0, []))
+                category["count_label"].configure(text=f"{count} passwords")
+
+                for j, service_label in enumerate(category["service_labels"]):
+                    if j < len(websites):
+                        service_label.configure(text=f"• {websites[j]}")
+                        service_label.grid()
+                    else:
+                        service_label.grid_remove()
+
+                if count > 3:
+                    category["more_label"].configure(text=f"+ {count - 3} more...")
+                    category["more_label"].grid()
+                else:
+                    category["more_label"].grid_remove()
+
+        return refresh
 
     # Displays form for adding a new login entry under the given user
     def show_add_login(uid: int, frame):
-        clear_screen(frame)
         main_container = ctk.CTkFrame(frame, fg_color="transparent")
         main_container.pack(fill='both', expand=True)
 
@@ -679,7 +854,7 @@ def cypher(user_id: int, encryption_key, supabase):
         strength_label = ctk.CTkLabel(strength_frame, text="Weak", text_color="red", font=("Tahoma", 12))
         strength_label.pack(side="left", padx=10)
 
-        password_entry.bind("<KeyRelease>", lambda event: password_strength(password_entry_var.get(), strength_label, strength_bar))
+        bind_strength_meter(password_entry, password_entry_var, strength_label, strength_bar)
 
         # 5. Confirm Password Frame
         confirm_password_frame = ctk.CTkFrame(form_container, fg_color="transparent")
@@ -748,9 +923,24 @@ def cypher(user_id: int, encryption_key, supabase):
                                       font=("Tahoma", 14),
                                       height=30,
                                       corner_radius=10,
-                                      command = lambda: show_category(frame, uid, "All"))
+                                      command = lambda: cancel_add_login())
         cancel_button.pack(side="left", padx=5)
 
+        # The form is kept between visits, so it is emptied once it has been used
+        def reset_form():
+            website_entry.delete(0, "end")
+            username_entry.delete(0, "end")
+            password_entry_var.set("")
+            confirm_password_entry_var.set("")
+            domain_var.set(".com")
+            category_var.set("Websites")
+            strength_bar.set(0)
+            strength_label.configure(text="Weak", text_color="red")
+
+        def cancel_add_login():
+            reset_form()
+            show_category("All")
+
         # Saves the new login to local DB and confirms success
         def save_login():
             website = website_entry.get()
@@ -772,42 +962,94 @@ def cypher(user_id: int, encryption_key, supabase):
                 messagebox.showerror("Error", "Password must be at least 6 characters!")
                 return
 
+            # Warn before saving a second login for a website that is already saved, or one that looks like a typo of one
+            similar = find_similar_websites(uid, normalize_website(website, top_level_domain), limit = 3)
+            if similar:
+                websites = ", ".join(similar_website for similar_website, score in similar)
+                if not messagebox.askyesno("Similar Login Exists", f"You already have logins for: {websites}\n\nSave this login anyway?"):
+                    return
+
             store_password(uid, website, username, password, category, encryption_key, top_level_domain)
             messagebox.showinfo("Success", "Login saved successfully!")
-            show_category(frame, uid, category)
+            reset_form()
+            show_category(category)
 
     # Lists saved logins filtered by category or favorites
-    def show_category(frame, u_id, category, favorite = None):
-        clear_screen(frame)
+    def show_category(category, favorite = None):
+        screens.show("logins", category, favorite)
 
+    # Builds the login list screen once; refresh() swaps in the rows for a category
+    def show_logins_screen(frame):
         details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
 
         header_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
         header_frame.pack(pady = 10, padx = 20, fill = "x")
 
-        if category == "Favorites":
-            title_text = f"Showing Favorite Logins"
-        elif category and category != "All":
-            title_text = f"Showing {category} Logins"
-        else:
-            title_text = f"Showing All Logins"
+        title_label = ctk.CTkLabel(header_frame, text = "", font = ("Tahoma", 18, "bold"))
+        title_label.pack(side = "left", pady = 5)
 
-        ctk.CTkLabel(header_frame, text = title_text, font = ("Tahoma", 18, "bold")).pack(side = "left", pady = 5)
+        shown = {"category": "All"}
 
-        passwords_frame = ctk.CTkScrollableFrame(details_frame, orientation = "vertical")
+        # Only the rows on screen get widgets; logins are read from the database a page at a time
+        passwords_frame = VirtualList(details_frame, [],
+                                      format_row = lambda login_data: f"{login_data[1]} | {login_data[0]}",
+                                      on_select = lambda login_data: screens.show_page(show_password_details, login_data, shown["category"]))
         passwords_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
 
-        passwords = get_login_data(u_id, encryption_key, category, favorite)
-        for login_data in passwords:
-            login_frame = ctk.CTkFrame(passwords_frame, fg_color = "transparent")
-            login_frame.pack(pady = 5, fill = "x")
+        def refresh(category, favorite = None):
+            # Stay at the same scroll position when the same list is reloaded after an edit
+            first = passwords_frame.first if category == shown["category"] else 0
+            shown["category"] = category
+
+            if category == "Favorites":
+                title_text = f"Showing Favorite Logins"
+            elif category and category != "All":
+                title_text = f"Showing {category} Logins"
+            else:
+                title_text = f"Showing All Logins"
+            title_label.configure(text = title_text)
+
+            passwords_frame.set_rows(PagedRows(lambda offset, limit: get_login_data(user_id, encryption_key, category, favorite, limit, offset),
+                                               count_logins(user_id, category, favorite)), first)
+
+        return refresh
+
+    # Builds the search results screen once; refresh() runs the search for new text
+    def show_search_screen(frame):
+        details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
+        details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
+
+        header_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        header_frame.pack(pady = 10, padx = 20, fill = "x")
 
-            ctk.CTkButton(login_frame, text = f"{login_data[1]} | {login_data[0]}", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda p = login_data: show_password_details(frame, p, category)).pack(pady = 5)
+        title_label = ctk.CTkLabel(header_frame, text = "", font = ("Tahoma", 18, "bold"))
+        title_label.pack(side = "left", pady = 5)
+
+        results_frame = VirtualList(details_frame, [],
+                                    format_row = lambda login_data: f"{login_data[1]} | {login_data[0]}",
+                                    on_select = lambda login_data: screens.show_page(show_password_details, login_data, login_data[5]))
+        results_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
+
+        def refresh(text):
+            results = search_logins(user_id, encryption_key, text)
+            similar = [] if results else find_similar_websites(user_id, text)
+            if similar:
+                # Nothing starts with what was typed; fall back to websites it may be a typo of
+                results = get_logins_for_websites(user_id, encryption_key, [website for website, score in similar])
+                title_label.configure(text = f"No exact matches for \"{text}\", showing similar websites")
+            elif not results:
+                title_label.configure(text = f"No logins match \"{text}\"")
+            elif len(results) == SEARCH_LIMIT:
+                title_label.configure(text = f"First {SEARCH_LIMIT} results for \"{text}\"")
+            else:
+                title_label.configure(text = f"Results for \"{text}\"")
+            results_frame.set_rows(results)
+
+        return refresh
 
     # Shows details for a selected entry and allows actions
     def show_password_details(frame, login_data, category):
-        clear_screen(frame)
 
         details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
@@ -816,7 +1058,7 @@ def cypher(user_id: int, encryption_key, supabase):
         header_frame.pack(pady = 10, fill = "x")
 
         ctk.CTkLabel(header_frame, text=f"Credentials For {login_data[0]}", font = ("Tahoma", 18, "bold")).pack(side = "left", padx = 10)
-        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: show_category(frame, user_id, category))
+        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: screens.show_last())
         back_btn.pack(side = "right", padx = 10)
 
         cred_card = ctk.CTkFrame(details_frame, corner_radius=15, border_width=1, border_color="#3C3C3C")
@@ -897,12 +1139,11 @@ def cypher(user_id: int, encryption_key, supabase):
         action_frame = ctk.CTkFrame(details_frame, fg_color="transparent")
         action_frame.pack(pady = 20)
 
-        ctk.CTkButton(action_frame, text="Edit", command = lambda: edit_login_gui(frame, login_data[0], login_data[1], login_data[2], "All", login_data)).pack(side = "left", padx = 5)
+        ctk.CTkButton(action_frame, text="Edit", command = lambda: screens.show_page(edit_login_gui, login_data[0], login_data[1], login_data[2], "All", login_data)).pack(side = "left", padx = 5)
         ctk.CTkButton(action_frame, text="Delete", fg_color="red", command=lambda: delete_login_gui(frame, user_id, login_data[0], login_data[4])).pack(side="left", padx=5)
 
     # Displays UI for editing an existing login entry
     def edit_login_gui(frame1, website, username, password, category, all_login_data):
-        clear_screen(frame1)
 
         details_frame = ctk.CTkFrame(frame1, fg_color = "transparent")
         details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
@@ -911,7 +1152,7 @@ def cypher(user_id: int, encryption_key, supabase):
         header_frame.pack(pady = 10, fill = "x")
 
         ctk.CTkLabel(header_frame, text=f"Edit Login", font = ("Tahoma", 18, "bold")).pack(side = "left", padx = 10)
-        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: show_password_details(frame1, all_login_data, category))
+        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: screens.show_page(show_password_details, all_login_data, category))
         back_btn.pack(side = "right", padx = 10)
 
         cred_card = ctk.CTkFrame(details_frame, corner_radius=15, border_width=1, border_color="#3C3C3C")
@@ -976,13 +1217,12 @@ def cypher(user_id: int, encryption_key, supabase):
         if confirm:
             delete_login(userid, password_id)
             messagebox.showinfo("Deleted", "Login deleted successfully!")
-            show_category(frame, userid, "All")
+            show_category("All")
 
     manager_win.protocol("WM_DELETE_WINDOW", lambda: close_app(manager_win))
 
     # Password generator tool: UI for specifying length, specials, then generate
     def generator_screen(frame):
-        clear_screen(frame)
 
         details_frame = ctk.CTkFrame(frame, fg_color="transparent")
         details_frame.pack(pady=20, padx=20, fill="both", expand=True)
@@ -1103,6 +1343,34 @@ def cypher(user_id: int, encryption_key, supabase):
         length_slider.pack(fill="x", padx=5)
         length_slider.set(16)  # Default length
 
+        mode_var = ctk.StringVar(value="Password")
+        mode_button = ctk.CTkSegmentedButton(
+            options_frame,
+            values=["Password", "Passphrase"],
+            variable=mode_var)
+        mode_button.pack(anchor="w", pady=(5, 0))
+
+        # Passphrase mode ignores the length and special character options
+        def generate(count):
+            if mode_var.get() == "Passphrase":
+                return generate_passphrases(count)
+            length = int(length_slider.get())
+            return generate_passwords(count, length, min(int(special_chars_var.get()), length - 3))
+
+        def export_to_csv():
+            path = filedialog.asksaveasfilename(
+                title=f"Save {BULK_GENERATE_COUNT:,} generated passwords",
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv")])
+            if not path:
+                return
+            try:
+                export_passwords_csv(path, generate(BULK_GENERATE_COUNT))
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not write {path}: {e}")
+                return
+            messagebox.showinfo("Success", f"Saved {BULK_GENERATE_COUNT:,} passwords to {path}.\nThey are not encrypted; delete the file once you are done with it.")
+
         btns_frame = ctk.CTkFrame(generator_frame, fg_color="transparent")
         btns_frame.pack(pady=(5, 15), padx=15, fill="x")
 
@@ -1113,7 +1381,7 @@ def cypher(user_id: int, encryption_key, supabase):
             height=36,
             corner_radius=6,
             font=("Tahoma", 13),
-            command=lambda: gen_set_password(generator_entry_var, None, None, None, int(length_slider.get()), int(special_chars_var.get())))
+            command=lambda: generator_entry_var.set(generate(1)[0]))
         generator_btn.pack(side="left", padx=(0, 10))
 
         copy_btn = ctk.CTkButton(
@@ -1126,9 +1394,18 @@ def cypher(user_id: int, encryption_key, supabase):
             command=lambda: copy_to_clipboard(generator_frame, generator_entry.get()))
         copy_btn.pack(side="left")
 
+        export_btn = ctk.CTkButton(
+            btns_frame,
+            text=f"Export {BULK_GENERATE_COUNT:,} to CSV",
+            width=150,
+            height=36,
+            corner_radius=6,
+            font=("Tahoma", 13),
+            command=export_to_csv)
+        export_btn.pack(side="right")
+
     # Cloud sync UI: smart sync, full sync, fetch from Supabase
     def show_cloud_screen(frame):
-        clear_screen(frame)
 
         details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
@@ -1150,7 +1427,7 @@ def cypher(user_id: int, encryption_key, supabase):
 
         smart_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         smart_btn_frame.pack(fill = "x", pady = 5)
-        smart_btn = ctk.CTkButton(smart_btn_frame, text = 'Smart Sync', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: sync_modified_rows_to_supabase(supaclient))
+        smart_btn = ctk.CTkButton(smart_btn_frame, text = 'Smart Sync', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: start_sync(lambda progress: sync_modified_rows_to_supabase(supaclient, progress = progress), "Smart sync"))
         smart_btn.pack(pady = (0,5))
 
         sync_all_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
@@ -1159,7 +1436,7 @@ def cypher(user_id: int, encryption_key, supabase):
 
         sync_all_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         sync_all_btn_frame.pack(fill = "x", pady = 5)
-        sync_all_btn = ctk.CTkButton(sync_all_btn_frame, text = 'Sync All Logins', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: sync_all_to_supabase(supaclient))
+        sync_all_btn = ctk.CTkButton(sync_all_btn_frame, text = 'Sync All Logins', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: start_sync(lambda progress: sync_all_to_supabase(supaclient, progress = progress), "Sync all"))
         sync_all_btn.pack(pady = 5)
 
         sync_from_supabase_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
@@ -1168,12 +1445,71 @@ def cypher(user_id: int, encryption_key, supabase):
 
         sync_from_supabase_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         sync_from_supabase_btn_frame.pack(fill = "x", pady = 5)
-        sync_from_supabase_btn = ctk.CTkButton(sync_from_supabase_btn_frame, text = 'Sync From Supabase', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: sync_from_supabase(user_id, supaclient))
+        sync_from_supabase_btn = ctk.CTkButton(sync_from_supabase_btn_frame, text = 'Sync From Supabase', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: start_sync(lambda progress: sync_from_supabase(user_id, supaclient, progress = progress), "Sync from Supabase"))
         sync_from_supabase_btn.pack(pady = 5)
 
+        status_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
+        status_frame.pack(fill = "x", pady = (15, 0))
+        sync_progress = ctk.CTkProgressBar(status_frame, width = 200)
+        sync_progress.set(0)
+        sync_status = ctk.CTkLabel(status_frame, text = "Sync in progress..." if sync_worker.busy else "", font = ("Tahoma", 12), text_color = "#A0A0A0")
+        sync_status.pack(pady = (5, 0))
+        pending_label = ctk.CTkLabel(status_frame, text = "", font = ("Tahoma", 12), text_color = "#A0A0A0")
+        pending_label.pack(pady = (5, 0))
+
+        # Runs a sync job on the background worker and reports back to this screen
+        def start_sync(job, description):
+            started = sync_worker.submit(job,
+                                         on_done = lambda count: finish_sync(description, count),
+                                         on_error = lambda error: fail_sync(description, error),
+                                         on_progress = update_sync_progress)
+            if not started:
+                messagebox.showinfo("Sync In Progress", "A sync is already running. Please wait for it to finish.")
+                return
+            if sync_status.winfo_exists():
+                sync_progress.pack(pady = 5)
+                sync_progress.configure(mode = "indeterminate")
+                sync_progress.start()
+                sync_status.configure(text = f"{description} in progress...")
+
+        def update_sync_progress(done, total):
+            if not sync_status.winfo_exists():
+                return
+            if total:
+                sync_progress.stop()
+                sync_progress.configure(mode = "determinate")
+                sync_progress.set(done / total)
+                sync_status.configure(text = f"{done} of {total} logins synced")
+            else:
+                sync_status.configure(text = f"{done} logins received")
+
+        def reset_sync_status(text):
+            if sync_status.winfo_exists():
+                sync_progress.stop()
+                sync_progress.pack_forget()
+                sync_status.configure(text = text)
+
+        def finish_sync(description, count):
+            reset_sync_status(f"{description} finished: {count} logins.")
+
+        def fail_sync(description, error):
+            reset_sync_status(f"{description} failed.")
+            handle_sync_error(error)
+
+        # Local changes are pushed in the background as they happen; show what is still waiting
+        def refresh():
+            pending = count_pending_changes(user_id)
+            if not pending:
+                pending_label.configure(text = "All local changes are uploaded.")
+            elif outbox_drainer:
+                pending_label.configure(text = f"{pending} local changes uploading...")
+            else:
+                pending_label.configure(text = f"{pending} local changes will upload when you are back online.")
+
+        return refresh
+
     # Screen for changing the master password with validation and update
     def change_password_screen(frame):
-        clear_screen(frame)
 
         password_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         password_frame.pack(fill = "both", pady = 20, padx = 20, expand = True)
@@ -1182,7 +1518,7 @@ def cypher(user_id: int, encryption_key, supabase):
         header_frame.pack(fill = "x", pady = 5, padx = 5)
         ctk.CTkLabel(header_frame, text = "Change Master Password", font = ("Tahoma", 18, "bold"), anchor = "e").pack(side = "left", pady = 5)
 
-        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: open_settings(frame))
+        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: screens.show("settings"))
         back_btn.pack(side = "right", pady = 5)
 
         details_frame = ctk.CTkFrame(password_frame)
@@ -1245,28 +1581,202 @@ def cypher(user_id: int, encryption_key, supabase):
                 messagebox.showerror("Error", "Password must be at least 6 characters!")
                 return
 
-            if change_master_password(user_id, old_password, new_password, supabase):
-                messagebox.showinfo("Success", "Password changed successfully!")
+            # Key derivation and re-encryption run on the auth worker
+            if not auth_worker.submit(lambda progress: change_master_password(user_id, old_password, new_password, supabase, progress),
+                                      on_done = finish_change,
+                                      on_error = lambda error: finish_change((False, str(error))),
+                                      on_progress = update_change_progress):
+                messagebox.showinfo("Please Wait", "Your master password is already being changed.")
+                return
+
+            change_btn.configure(state = "disabled", text = "Re-encrypting...")
+            change_progress.pack(pady = (0, 10))
+            change_progress.start()
+
+        def update_change_progress(done, total):
+            if change_btn.winfo_exists() and total:
+                change_progress.stop()
+                change_progress.configure(mode = "determinate")
+                change_progress.set(done / total)
+
+        def finish_change(result):
+            success, error = result
+            if change_btn.winfo_exists():
+                change_progress.stop()
+                change_progress.configure(mode = "indeterminate")
+                change_progress.pack_forget()
+                change_btn.configure(state = "normal", text = "Change Master Password")
+
+            if success:
+                # The session key is stale once the vault is re-encrypted
+                messagebox.showinfo("Success", "Password changed successfully! Please log in with your new password.")
+                end_session(manager_win)
             else:
-                messagebox.showerror("Error", "Unable to change password!")
+                messagebox.showerror("Error", f"Unable to change password!\n{error or ''}")
 
         generate_password_btn = ctk.CTkFrame(frame, fg_color = "transparent")
         generate_password_btn.pack(side = "left", fill = "x", pady = 0, padx = 85)
 
-        ctk.CTkButton(generate_password_btn, text = "Change Master Password", command = lambda: attempt_change()).pack(pady = 10)
+        change_btn = ctk.CTkButton(generate_password_btn, text = "Change Master Password", command = lambda: attempt_change())
+        change_btn.pack(pady = 10)
+        change_progress = ctk.CTkProgressBar(generate_password_btn, mode = "indeterminate", width = 180)
+
+    # Exports the vault to a passphrase-protected archive file, or restores one, for moving between machines
+    def vault_archive_page(frame):
+
+        archive_frame = ctk.CTkFrame(frame, fg_color = "transparent")
+        archive_frame.pack(fill = "both", pady = 20, padx = 20, expand = True)
+
+        header_frame = ctk.CTkFrame(archive_frame, fg_color = "transparent")
+        header_frame.pack(fill = "x", pady = 5, padx = 5)
+        ctk.CTkLabel(header_frame, text = "Vault Archive", font = ("Tahoma", 18, "bold"), anchor = "e").pack(side = "left", pady = 5)
+
+        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: screens.show("settings"))
+        back_btn.pack(side = "right", pady = 5)
+
+        details_frame = ctk.CTkFrame(archive_frame)
+        details_frame.pack(fill = "both", pady = 15, padx = 15, expand = True)
+
+        info_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        info_frame.pack(fill = "x", pady = 5, padx = 20)
+        ctk.CTkLabel(info_frame, text = "Move your logins to another machine without Supabase.\nThe archive is encrypted with the passphrase below.",
+                     font = ("Tahoma", 12), text_color = "#A0A0A0", justify = "left").pack(side = "left", pady = (5, 0), padx = 5)
 
-    # Allows user to backup database
+        passphrase_label_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        passphrase_label_frame.pack(fill = "x", pady = 3, padx = 20)
+        ctk.CTkLabel(passphrase_label_frame, text = "Archive Passphrase", font = ("Tahoma", 14), text_color = "#A0A0A0").pack(side = "left", pady = 0, padx = 5)
+
+        passphrase_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        passphrase_frame.pack(fill = "x", pady = 5, padx = 20)
+        passphrase_entry = ctk.CTkEntry(passphrase_frame, width = 200, show = "*", border_color="#3C3C3C", fg_color="#1F1F1F")
+        passphrase_entry.pack(side = "left", pady = 1, padx = 5)
+
+        toggle_btn = ctk.CTkButton(passphrase_frame, text="👁", font=("Arial", 16), fg_color="transparent", hover_color="gray", width=30, height=30, command=lambda: toggle_password_visibility(passphrase_entry, confirm_entry))
+        toggle_btn.pack(side = "left", padx = 0)
+
+        confirm_label_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        confirm_label_frame.pack(fill = "x", pady = 3, padx = 20)
+        ctk.CTkLabel(confirm_label_frame, text = "Confirm Passphrase (export only)", font = ("Tahoma", 14), text_color = "#A0A0A0").pack(side = "left", pady = 0, padx = 5)
+
+        confirm_frame = ctk.CTkFrame(details_frame, fg_color = "transparent")
+        confirm_frame.pack(fill = "x", pady = 5, padx = 20)
+        confirm_entry = ctk.CTkEntry(confirm_frame, width = 200, show = "*", border_color="#3C3C3C", fg_color="#1F1F1F")
+        confirm_entry.pack(side = "left", pady = 5, padx = 5)
+
+        def attempt_export():
+            passphrase = passphrase_entry.get()
+            if len(passphrase) < 8:
+                messagebox.showerror("Error", "The passphrase must be at least 8 characters!")
+                return
+            if passphrase != confirm_entry.get():
+                messagebox.showerror("Error", "Passphrases do not match!")
+                return
+
+            path = filedialog.asksaveasfilename(
+                title = "Export vault archive",
+                defaultextension = ARCHIVE_EXTENSION,
+                filetypes = [("Cypher vault archives", f"*{ARCHIVE_EXTENSION}")])
+            if path:
+                start_archive_job(lambda progress: export_archive(user_id, encryption_key, path, passphrase, progress),
+                                  "Exporting...", lambda count: messagebox.showinfo("Success", f"Exported {count:,} logins to {path}."))
+
+        def attempt_restore():
+            passphrase = passphrase_entry.get()
+            if not passphrase:
+                messagebox.showerror("Error", "Enter the archive's passphrase!")
+                return
+
+            path = filedialog.askopenfilename(
+                title = "Restore vault archive",
+                filetypes = [("Cypher vault archives", f"*{ARCHIVE_EXTENSION}"), ("All files", "*.*")])
+            if path:
+                start_archive_job(lambda progress: restore_archive(user_id, path, passphrase, encryption_key, progress),
+                                  "Restoring...", finish_restore)
+
+        def finish_restore(result):
+            imported, skipped = result
+            message = f"Restored {imported:,} logins."
+            if skipped:
+                message += f"\n{skipped:,} were already in your vault and were skipped."
+            messagebox.showinfo("Success", message)
+
+        # Runs an export or restore on the background worker, showing its progress on this page
+        def start_archive_job(job, busy_text, on_success):
+            if not sync_worker.submit(job,
+                                      on_done = lambda result: finish_archive_job(result, on_success),
+                                      on_error = fail_archive_job,
+                                      on_progress = update_archive_progress):
+                messagebox.showinfo("Please Wait", "A sync or import is already running. Please wait for it to finish.")
+                return
+            export_btn.configure(state = "disabled")
+            restore_btn.configure(state = "disabled", text = busy_text)
+            archive_progress.set(0)
+            archive_progress.pack(pady = (0, 10))
+
+        def update_archive_progress(done, total):
+            if archive_progress.winfo_exists() and total:
+                archive_progress.set(done / total)
+
+        def reset_archive_page():
+            if restore_btn.winfo_exists():
+                archive_progress.pack_forget()
+                export_btn.configure(state = "normal")
+                restore_btn.configure(state = "normal", text = "Restore Archive")
+
+        def finish_archive_job(result, on_success):
+            reset_archive_page()
+            on_success(result)
+
+        def fail_archive_job(error):
+            reset_archive_page()
+            messagebox.showerror("Error", f"Vault archive failed!\n{error}")
+
+        archive_btns_frame = ctk.CTkFrame(frame, fg_color = "transparent")
+        archive_btns_frame.pack(side = "left", fill = "x", pady = 0, padx = 85)
+
+        export_btn = ctk.CTkButton(archive_btns_frame, text = "Export Archive", command = lambda: attempt_export())
+        export_btn.pack(pady = (10, 5))
+        restore_btn = ctk.CTkButton(archive_btns_frame, text = "Restore Archive", command = lambda: attempt_restore())
+        restore_btn.pack(pady = (5, 10))
+        archive_progress = ctk.CTkProgressBar(archive_btns_frame, width = 180)
+
+    # Allows user to backup database; the copy runs on the background worker
     def backup_db_win(frame):
-        confirm = messagebox.askyesno("Backup database", f'Are you sure you want to backup your database? This will replace a previously backed up database.')
+        confirm = messagebox.askyesno("Backup database", f'Are you sure you want to backup your database? Older backups beyond the last few are removed.')
         if confirm:
-            if backup_database():
-                messagebox.showinfo("Success", "Database backup saved successfully!")
-            else:
-                messagebox.showinfo("Error", "Unable to backup database!")
+            if not sync_worker.submit(lambda progress: backup_database(progress),
+                                      on_done = lambda success: messagebox.showinfo("Success", "Database backup saved successfully!") if success
+                                                                else messagebox.showinfo("Error", "Unable to backup database!"),
+                                      on_error = lambda error: messagebox.showinfo("Error", f"Unable to backup database!\n{error}")):
+                messagebox.showinfo("Please Wait", "A sync or import is already running. Please wait for it to finish.")
+
+    # Restores the database from a backup generation after verifying it, then logs out
+    def restore_db_win(frame):
+        path = filedialog.askopenfilename(
+            title = "Restore database backup",
+            initialdir = get_backup_dir(),
+            filetypes = [("Cypher backups", f"*{BACKUP_SUFFIX}")])
+        if not path:
+            return
+        confirm = messagebox.askyesno("Restore database", "Replace all local data with this backup? The current database is backed up first, and you will be logged out.")
+        if not confirm:
+            return
+
+        def restore_job(progress):
+            restore_backup(path, progress)
+            migrate_database()
+
+        def finish_restore(result):
+            messagebox.showinfo("Success", "Database restored. Please log in again.")
+            end_session(manager_win)
+
+        if not sync_worker.submit(restore_job,
+                                  on_done = finish_restore,
+                                  on_error = lambda error: messagebox.showerror("Error", f"Unable to restore database!\n{error}")):
+            messagebox.showinfo("Please Wait", "A sync or import is already running. Please wait for it to finish.")
 
     # UI for deleting the master user account after credential re-entry
     def delete_master_user_page(frame):
-        clear_screen(frame)
 
         details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         details_frame.pack(fill = "both", pady = 20, padx = 20, expand = True)
@@ -1276,7 +1786,7 @@ def cypher(user_id: int, encryption_key, supabase):
         header_frame_2 = ctk.CTkFrame(details_frame, fg_color = "transparent")
         header_frame_2.pack(fill = "x", pady = 5)
 
-        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: open_settings(frame))
+        back_btn = ctk.CTkButton(header_frame, text = "Back", width = 80, command = lambda: screens.show("settings"))
         back_btn.pack(side = "right", pady = 5)
 
         ctk.CTkLabel(header_frame, text = "Delete Account", font = ("Tahoma", 18, "bold")).pack(side = "left", pady = 1)
@@ -1326,18 +1836,15 @@ def cypher(user_id: int, encryption_key, supabase):
                 success = delete_master_user(user_id, password)
                 if success:
                     messagebox.showinfo("Success", "Account and information permanently deleted.")
-                    clear_screen(app)
-                    app.deiconify()
-                    login_screen()
+                    end_session(manager_win)
                 else:
                     messagebox.showerror("Error", "Unable to delete account. Check your credentials.")
 
         delete_account_btn = ctk.CTkButton(frame, text = "Delete Account", fg_color = "red", height = 36, hover_color = "red", command = lambda: attempt_account_deletion())
         delete_account_btn.pack(pady = 10)
 
-    # Opens the settings menu: theme, appearance, backup, delete account
+    # Opens the settings menu: theme, appearance, backup and restore, vault archive, import, delete account
     def open_settings(settings_frame):
-        clear_screen(settings_frame)
 
         details_frame = ctk.CTkFrame(settings_frame, fg_color = "transparent")
         details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
@@ -1355,7 +1862,7 @@ def cypher(user_id: int, encryption_key, supabase):
 
         change_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         change_btn_frame.pack(fill = "x", pady = 5)
-        change_btn = ctk.CTkButton(change_btn_frame, text = 'Change Master Password', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: change_password_screen(settings_frame))
+        change_btn = ctk.CTkButton(change_btn_frame, text = 'Change Master Password', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show_page(change_password_screen))
         change_btn.pack(pady = (10,5))
 
         backup_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
@@ -1363,18 +1870,77 @@ def cypher(user_id: int, encryption_key, supabase):
         backup_btn = ctk.CTkButton(backup_btn_frame, text = 'Backup Password Database', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: backup_db_win(settings_frame))
         backup_btn.pack(pady = 5)
 
+        archive_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
+        archive_btn_frame.pack(fill = "x", pady = 5)
+        archive_btn = ctk.CTkButton(archive_btn_frame, text = 'Export or Restore Vault', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show_page(vault_archive_page))
+        archive_btn.pack(pady = 5)
+
+        restore_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
+        restore_btn_frame.pack(fill = "x", pady = 5)
+        restore_btn = ctk.CTkButton(restore_btn_frame, text = 'Restore Database Backup', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: restore_db_win(settings_frame))
+        restore_btn.pack(pady = 5)
+
+        import_btn_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
+        import_btn_frame.pack(fill = "x", pady = 5)
+        import_btn = ctk.CTkButton(import_btn_frame, text = 'Import Logins', width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: start_import())
+        import_btn.pack(pady = 5)
+        import_progress = ctk.CTkProgressBar(import_btn_frame, width = 200)
+        import_status = ctk.CTkLabel(import_btn_frame, text = "", font = ("Tahoma", 12), text_color = "#A0A0A0")
+
+        # Imports a browser, Bitwarden or KeePass export on the background worker, reporting progress here
+        def start_import():
+            path = filedialog.askopenfilename(
+                title = "Import logins from Chrome, Firefox, Bitwarden or KeePass",
+                filetypes = [("CSV or JSON exports", "*.csv *.json"), ("All files", "*.*")])
+            if not path:
+                return
+            started = sync_worker.submit(lambda progress: import_logins(user_id, path, encryption_key, progress = progress),
+                                         on_done = finish_import,
+                                         on_error = fail_import,
+                                         on_progress = update_import_progress)
+            if not started:
+                messagebox.showinfo("Sync In Progress", "A sync or import is already running. Please wait for it to finish.")
+                return
+            import_progress.set(0)
+            import_progress.pack(pady = 5)
+            import_status.pack()
+            import_status.configure(text = "Importing logins...")
+
+        def update_import_progress(done, total):
+            if import_status.winfo_exists():
+                import_progress.set(done / total)
+
+        def reset_import_status():
+            if import_status.winfo_exists():
+                import_progress.pack_forget()
+                import_status.pack_forget()
+
+        def finish_import(result):
+            imported, skipped = result
+            reset_import_status()
+            message = f"Imported {imported:,} logins."
+            if skipped:
+                message += f"\n{skipped:,} were already in your vault and were skipped."
+            messagebox.showinfo("Import Finished", message + "\nDelete the export file now; its passwords are not encrypted.")
+
+        def fail_import(error):
+            reset_import_status()
+            if isinstance(error, (ValueError, UnicodeDecodeError)):
+                messagebox.showerror("Import Failed", f"Could not read the export: {error}")
+            else:
+                messagebox.showerror("Import Failed", f"The import stopped: {error}\nLogins imported so far were kept; importing the same file again skips them.")
+
         change_theme_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         change_theme_frame.pack(fill = "x", pady = 5)
-        change_theme_btn = ctk.CTkButton(change_theme_frame, text = "Change Theme", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: change_theme_page(settings_frame))
+        change_theme_btn = ctk.CTkButton(change_theme_frame, text = "Change Theme", width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show_page(change_theme_page))
         change_theme_btn.pack(pady = 5)
 
         delete_account_frame = ctk.CTkFrame(buttons_frame, fg_color = "transparent")
         delete_account_frame.pack(side = "bottom", fill = "x", pady = 10)
-        delete_account_btn = ctk.CTkButton(delete_account_frame, text = "Delete Account", fg_color="red",  width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: delete_master_user_page(settings_frame))
+        delete_account_btn = ctk.CTkButton(delete_account_frame, text = "Delete Account", fg_color="red",  width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show_page(delete_master_user_page))
         delete_account_btn.pack(pady = 5)
 
     def change_theme_page(frame):
-        clear_screen(frame)
 
         top_details_frame = ctk.CTkFrame(frame, fg_color = "transparent")
         top_details_frame.pack(pady = 20, padx = 20, fill = "both", expand = True)
@@ -1382,7 +1948,7 @@ def cypher(user_id: int, encryption_key, supabase):
         top_header_frame = ctk.CTkFrame(top_details_frame, fg_color = "transparent")
         top_header_frame.pack(fill = "x", pady = 0)
 
-        back_btn = ctk.CTkButton(top_header_frame, text = "Back", width = 80, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: open_settings(frame))
+        back_btn = ctk.CTkButton(top_header_frame, text = "Back", width = 80, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda: screens.show("settings"))
         back_btn.pack(side = "right", pady = 5)
 
         themes_frame = ctk.CTkFrame(top_details_frame)
@@ -1418,8 +1984,27 @@ def cypher(user_id: int, encryption_key, supabase):
     def logout(win):
         confirm = messagebox.askyesno("Logout", f'Are you sure you want to logout?')
         if confirm:
-            win.destroy()
-            app.deiconify()
+            end_session(win)
+
+    # Drops cached secrets, closes the manager window and returns to log in
+    def end_session(win):
+        clear_password_cache()
+        forget_session_key()
+        unwatch_session()
+        stop_outbox()
+        new_session_token()
+        win.destroy()
+        app.deiconify()
+
+    screens.register("welcome", welcome_screen)
+    screens.register("categories", show_categories_screen)
+    screens.register("logins", show_logins_screen)
+    screens.register("search", show_search_screen)
+    screens.register("add_login", lambda frame: show_add_login(user_id, frame))
+    screens.register("generator", generator_screen)
+    screens.register("cloud", show_cloud_screen)
+    screens.register("settings", open_settings)
+    screens.show("welcome")
 
 # Utility: displays a strength bar and generate button for password fields
 def strength_bar_func(frame, password_var, password_confirm_var, update_var, bar_width):
@@ -1432,13 +2017,51 @@ def strength_bar_func(frame, password_var, password_confirm_var, update_var, bar
     generate_button = ctk.CTkButton(frame, text = "Generate",  command = lambda: gen_set_password(password_var, password_confirm_var, strength_label, strength_bar))
     generate_button.pack(pady = 5)
 
-    update_var.bind("<KeyRelease>", lambda event: password_strength(password_var.get(), strength_label, strength_bar))
+    bind_strength_meter(update_var, password_var, strength_label, strength_bar)
+
+# Changes whenever a vault is opened or its session ends, so work finishing for an ended session can tell
+session_token = 0
+
+def new_session_token():
+    global session_token
+    session_token += 1
+    return session_token
+
+# Pushes the outbox of local changes to Supabase while a user's cloud session is online
+outbox_drainer = None
+
+def start_outbox(user_id):
+    global outbox_drainer
+    stop_outbox()
+    outbox_drainer = OutboxDrainer(user_id, supaclient)
+    outbox_drainer.start()
+
+def stop_outbox():
+    global outbox_drainer
+    if outbox_drainer:
+        outbox_drainer.stop()
+        outbox_drainer = None
+
+# UI-side handler for errors raised by background sync jobs
+def handle_sync_error(error):
+    # A sync job has already loaded httpx, so this import is free
+    import httpx
+    if isinstance(error, httpx.TransportError):
+        messagebox.showwarning("No Internet Connection", "Could not reach Supabase")
+    else:
+        messagebox.showerror("Sync Error", f"Sync failed:\n{error}")
 
 def close_app(win):
+    stop_outbox()
+    backup_scheduler.stop()
+    clear_password_cache()
+    forget_session_key()
     win.destroy()
     app.destroy()
     exit()
 
 # Start Cypher
 login_screen()
+mark("login screen built")
+app.after_idle(lambda: mark("login screen shown"))
 app.mainloop()
\ No newline at end of file
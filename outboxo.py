@@ -0,0 +1,130 @@
+import threading
+from connectiono import get_connection, transaction
+from supacloud import password_row_to_cloud
+
+# Outbox entries replayed per round trip, and how long the drainer waits after a write so a burst goes out together
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_SETTLE_DELAY = 0.5
+
+# Backoff after a failed drain, doubling up to the maximum; idle drainers also re-check this often
+OUTBOX_RETRY_DELAY = 1
+OUTBOX_MAX_RETRY_DELAY = 300
+OUTBOX_POLL_INTERVAL = 60
+
+# The drainer of the current session; queued changes wake only this one
+_active_drainer = None
+
+def _wake_drainer():
+    drainer = _active_drainer
+    if drainer:
+        drainer._wakeup.set()
+
+def enqueue_change(cursor, password_id, operation):
+    """
+    Queue a cloud change for a login inside the caller's transaction, so the outbox entry
+    commits or rolls back together with the local write. operation is "upsert" or "delete";
+    a delete must be queued before the row is removed. The entry stores no row data:
+    the drainer sends the row as it is when the entry is replayed.
+    """
+    cursor.execute("insert into outbox (user_id, password_id, operation) select user_id, id, ? from passwords where id = ?",
+                   (operation, password_id))
+    _wake_drainer()
+
+def enqueue_changes(cursor, password_ids, operation):
+    """
+    Queue the same cloud change for many logins inside the caller's transaction, as enqueue_change() does for one.
+    """
+    cursor.executemany("insert into outbox (user_id, password_id, operation) select user_id, id, ? from passwords where id = ?",
+                       [(operation, password_id) for password_id in password_ids])
+    _wake_drainer()
+
+def count_pending_changes(user_id):
+    """
+    Return the number of queued cloud changes for the user.
+    """
+    return get_connection().execute("select count(*) from outbox where user_id = ?", (user_id,)).fetchone()[0]
+
+def drain_outbox(user_id, supabase, batch_size = OUTBOX_BATCH_SIZE):
+    """
+    Replay the user's outbox to Supabase, oldest entries first, batch_size entries per round.
+    Within a batch only the latest operation per login is sent: one upsert request for the
+    rows that still exist and are syncable, one delete request for the rest.
+    Entries are removed only after Supabase confirmed them; errors propagate and leave
+    the remaining entries queued. Returns the number of entries replayed.
+    """
+    conn = get_connection()
+    replayed = 0
+    while True:
+        entries = conn.execute("select seq, password_id, operation from outbox where user_id = ? order by seq limit ?",
+                               (user_id, batch_size)).fetchall()
+        if not entries:
+            return replayed
+
+        latest = {}
+        for seq, password_id, operation in entries:
+            latest[password_id] = operation
+
+        upsert_ids = [password_id for password_id, operation in latest.items() if operation == "upsert"]
+        delete_ids = [password_id for password_id, operation in latest.items() if operation == "delete"]
+
+        rows = []
+        if upsert_ids:
+            placeholders = ", ".join("?" * len(upsert_ids))
+            rows = conn.execute(f"""
+            select id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable
+            from passwords where id in ({placeholders}) and syncable = 1
+            """, upsert_ids).fetchall()
+
+        if rows:
+            supabase.schema("api").from_("passwords").upsert([password_row_to_cloud(row) for row in rows]).execute()
+        if delete_ids:
+            supabase.schema("api").from_("passwords").delete().in_("id", delete_ids).execute()
+
+        # Entries queued while the requests were in flight have higher seqs and stay for the next round
+        with transaction() as cursor:
+            cursor.execute("delete from outbox where user_id = ? and seq <= ?", (user_id, entries[-1][0]))
+        replayed += len(entries)
+
+class OutboxDrainer:
+    """
+    Background thread that pushes a user's outbox to Supabase shortly after each local write,
+    and retries with exponential backoff while Supabase cannot be reached.
+    Start it once the cloud session is online and stop it when the vault is locked.
+    """
+    def __init__(self, user_id, supabase, on_error = None):
+        self.user_id = user_id
+        self.supabase = supabase
+        self.on_error = on_error
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = "cypher-outbox", daemon = True)
+
+    def start(self):
+        global _active_drainer
+        _active_drainer = self
+        self._thread.start()
+
+    def stop(self):
+        global _active_drainer
+        if _active_drainer is self:
+            _active_drainer = None
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        delay = OUTBOX_RETRY_DELAY
+        while not self._stopped.is_set():
+            try:
+                drain_outbox(self.user_id, self.supabase)
+                delay = OUTBOX_RETRY_DELAY
+            except Exception as e:
+                print(f"Could not push queued changes to Supabase, retrying in {delay}s: {e}")
+                if self.on_error:
+                    self.on_error(e)
+                self._stopped.wait(delay)
+                delay = min(delay * 2, OUTBOX_MAX_RETRY_DELAY)
+                continue
+
+            self._wakeup.wait(OUTBOX_POLL_INTERVAL)
+            self._wakeup.clear()
+            self._stopped.wait(OUTBOX_SETTLE_DELAY)
@@ -1,76 +1,262 @@
-import random
-import re
+import csv
+import math
+import mmap
+import os
 import string
+from functools import lru_cache
+
+SPECIAL_CHARS = '!@#$%^&*(),.?":{}|<>'
+PASSWORD_ALPHABET = string.ascii_lowercase + string.ascii_uppercase + string.digits + SPECIAL_CHARS
+
+PASSPHRASE_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "passphrase_words.txt")
+PASSPHRASE_WORD_COUNT = 5
+
+# Passwords written by the generator's bulk CSV export
+BULK_GENERATE_COUNT = 1000
+
+# Random bytes read from the OS per refill; one read covers a batch of passwords
+RANDOM_CHUNK_SIZE = 4096
+
+_passphrase_words = None
+
+@lru_cache(maxsize = None)
+def _byte_table(alphabet):
+    """
+    Translation table mapping a random byte to a character of alphabet, and the bytes to
+    reject so every character stays equally likely (256 is rarely a multiple of its length).
+    """
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[byte % len(alphabet)]) if byte < limit else 0 for byte in range(256))
+    return table, bytes(range(limit, 256))
+
+def random_chars(alphabet, count):
+    """
+    Return count characters drawn uniformly from alphabet (ASCII, at most 256 characters) using
+    os.urandom. Bytes are read in bulk and mapped, with rejection sampling, by bytes.translate.
+    """
+    table, rejected = _byte_table(alphabet)
+    chars = b""
+    while len(chars) < count:
+        # Rejection throws some bytes away, so read a little more than is still missing
+        missing = count - len(chars)
+        chars += os.urandom(missing + missing * len(rejected) // (256 - len(rejected)) + 16).translate(table, rejected)
+    return chars[:count].decode("ascii")
+
+def _random_below(n, random_bytes):
+    """
+    Return a uniform random integer in range(n) from the byte iterator random_bytes, for n of up to 65536.
+    """
+    width = 1 if n <= 256 else 2
+    space = 256 ** width
+    limit = space - space % n
+    while True:
+        value = next(random_bytes) if width == 1 else next(random_bytes) << 8 | next(random_bytes)
+        if value < limit:
+            return value % n
+
+def _random_byte_stream():
+    """
+    Yield random bytes forever, reading them from os.urandom RANDOM_CHUNK_SIZE at a time.
+    """
+    while True:
+        yield from os.urandom(RANDOM_CHUNK_SIZE)
+
+def generate_passwords(count, length = 16, min_special_chars = 2):
+    """
+    Generate count random passwords, each with at least one lowercase letter, uppercase letter
+    and digit and min_special_chars special characters. All the randomness comes from a few
+    bulk os.urandom reads rather than one call per character.
+    """
+    free_length = length - 3 - min_special_chars
+    if free_length < 0:
+        raise ValueError(f"A {length}-character password cannot hold 3 + {min_special_chars} required characters")
+
+    lowercase = random_chars(string.ascii_lowercase, count)
+    uppercase = random_chars(string.ascii_uppercase, count)
+    digits = random_chars(string.digits, count)
+    specials = random_chars(SPECIAL_CHARS, count * min_special_chars)
+    free_chars = random_chars(PASSWORD_ALPHABET, count * free_length)
+    random_bytes = _random_byte_stream()
+
+    passwords = []
+    for index in range(count):
+        password = [lowercase[index], uppercase[index], digits[index]]
+        password += specials[index * min_special_chars:(index + 1) * min_special_chars]
+        password += free_chars[index * free_length:(index + 1) * free_length]
+
+        # Fisher-Yates, so the required characters can land anywhere
+        for i in range(length - 1, 0, -1):
+            j = _random_below(i + 1, random_bytes)
+            password[i], password[j] = password[j], password[i]
+        passwords.append("".join(password))
+    return passwords
 
 def generate_password(length = 16, min_special_chars = 2):
     """
     Generate a random password meeting basic complexity requirements.
     """
-    lowercase = random.choice(string.ascii_lowercase)
-    uppercase = random.choice(string.ascii_uppercase)
-    nums = random.choice(string.digits)
-    special_chars = '!@#$%^&*(),.?":{}|<>'''
+    return generate_passwords(1, length, min_special_chars)[0]
 
-    required_chars = [lowercase, uppercase, nums]
+def load_passphrase_words():
+    """
+    Return the bundled passphrase wordlist, reading it on first use.
+    """
+    global _passphrase_words
+    if _passphrase_words is None:
+        with open(PASSPHRASE_WORDS_FILE, encoding = "utf-8") as f:
+            _passphrase_words = f.read().split()
+    return _passphrase_words
 
-    for _ in range(min_special_chars):
-        required_chars.append(random.choice(special_chars))
+def generate_passphrases(count, word_count = PASSPHRASE_WORD_COUNT, separator = "-"):
+    """
+    Generate count passphrases of word_count words picked uniformly from the bundled wordlist.
+    Each word adds log2(len(wordlist)) bits, about 10.9 with the bundled list.
+    """
+    words = load_passphrase_words()
+    random_bytes = _random_byte_stream()
+    return [separator.join(words[_random_below(len(words), random_bytes)] for _ in range(word_count)) for _ in range(count)]
 
-    remaining_length = length - len(required_chars)
+def export_passwords_csv(path, passwords):
+    """
+    Write generated passwords to a CSV file, one per row under a "password" header.
+    """
+    with open(path, "w", newline = "", encoding = "utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["password"])
+        writer.writerows([password] for password in passwords)
 
-    all_chars = lowercase + uppercase + nums + special_chars
-    remaining_chars = [random.choice(all_chars) for _ in range(remaining_length)]
+# Rating tiers, weakest first: (label, label colour, bar value, minimum entropy in bits)
+STRENGTH_TIERS = (
+    ("Weak", "red", 0.1, 0),
+    ("Fair", "yellow", 0.3, 28),
+    ("Good", "orange", 0.6, 36),
+    ("Strong", "green", 0.8, 60),
+    ("Excellent", "#00FF00", 1, 80),
+)
 
-    password = required_chars + remaining_chars
+# Entropy credited to a password found in the common-password list, whatever its length
+COMMON_PASSWORD_BITS = 10
 
-    random.shuffle(password)
-    return ''.join(password)
+# Pause in typing before the strength meter re-rates the password
+STRENGTH_DELAY_MS = 120
+
+COMMON_PASSWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "common_passwords.txt")
+
+_common_passwords = None
+
+def is_common_password(password):
+    """
+    Check a password against the bundled list of common passwords, ignoring case and trailing
+    digits or symbols ('Password123!' counts as 'password'). The list is a sorted file that is
+    binary-searched through mmap, so it is never read into memory as a whole.
+    """
+    global _common_passwords
+    if _common_passwords is None:
+        try:
+            with open(COMMON_PASSWORDS_FILE, "rb") as f:
+                _common_passwords = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"Common password list unavailable: {e}")
+            _common_passwords = b""
+
+    lowered = password.lower()
+    candidates = {lowered, lowered.rstrip(string.digits + string.punctuation)}
+    return any(candidate and _sorted_lines_contain(_common_passwords, candidate.encode()) for candidate in candidates)
+
+def _sorted_lines_contain(data, word):
+    """
+    Binary search for word as a whole line in data, a buffer of newline-terminated lines in byte order.
+    """
+    low, high = 0, len(data)
+    while low < high:
+        middle = (low + high) // 2
+        line_start = data.rfind(b"\n", 0, middle) + 1
+        line_end = data.find(b"\n", line_start)
+        if line_end == -1:
+            line_end = len(data)
+        line = data[line_start:line_end]
+        if line == word:
+            return True
+        if line < word:
+            low = line_end + 1
+        else:
+            high = line_start
+    return False
+
+def estimate_entropy(password):
+    """
+    Estimate a password's entropy in bits from its length and the character classes it uses,
+    in a single pass. Characters that repeat or continue a run from the previous one
+    ('aaa', 'abc', '123') add nothing, and common passwords are capped at COMMON_PASSWORD_BITS.
+    """
+    lower = upper = digit = special = other = False
+    predictable = 0
+    previous = None
+    for char in password:
+        if "a" <= char <= "z":
+            lower = True
+        elif "A" <= char <= "Z":
+            upper = True
+        elif "0" <= char <= "9":
+            digit = True
+        elif char in string.punctuation or char == " ":
+            special = True
+        else:
+            other = True
+
+        if previous is not None and ord(char) - ord(previous) in (0, 1):
+            predictable += 1
+        previous = char
+
+    pool = 26 * lower + 26 * upper + 10 * digit + 33 * special + 100 * other
+    if not pool:
+        return 0.0
+
+    bits = (len(password) - predictable) * math.log2(pool)
+    if bits > COMMON_PASSWORD_BITS and is_common_password(password):
+        bits = COMMON_PASSWORD_BITS
+    return bits
+
+def rate_password(password):
+    """
+    Return the index into STRENGTH_TIERS for a password.
+    """
+    bits = estimate_entropy(password)
+    tier = 0
+    for index, (_, _, _, minimum_bits) in enumerate(STRENGTH_TIERS):
+        if bits >= minimum_bits:
+            tier = index
+    return tier
 
 def password_strength(password: str, strength_label, strength_bar):
     """
     Evaluate password strength and update UI label and progress bar.
+    The widgets are only reconfigured when the rating differs from what they already show.
     """
-    strength = 0
-
-    if len(password) >= 6:
-        strength += 3
-    if re.search(r"[A-Z]", password):
-        strength += 2
-    if re.search(r"[0-9]", password):
-        strength += 2
-
-    special_chars = re.findall(r"[!@#$%^&*(),.?\":{}|<>]", password)
-    if len(special_chars) == 1:
-        strength +=2
-    if len(special_chars) > 1:
-        strength +=3
-
-    if len(password) <= 6:
-        strength -= 3
-    upper_chars = re.findall(r"[A-Z]", password)
-    if len(upper_chars) < 1:
-        strength -= 1
-    lower_chars = re.findall(r"[a-z]", password)
-    if len(lower_chars) < 1:
-        strength -= 1
-
-    strength = min(strength, 10)
-
-    if strength < 3:
-        strength_label.configure(text = "Weak", text_color = "red")
-        strength_bar.set(0.1)
-    elif strength < 5:
-        strength_label.configure(text = "Fair", text_color = "yellow")
-        strength_bar.set(0.3)
-    elif strength < 7:
-        strength_label.configure(text = "Good", text_color = "orange")
-        strength_bar.set(0.6)
-    elif strength < 9:
-        strength_label.configure(text = "Strong", text_color = "green")
-        strength_bar.set(0.8)
-    else:
-        strength_label.configure(text = "Excellent", text_color = "#00FF00")
-        strength_bar.set(1)
+    label, color, bar_value, _ = STRENGTH_TIERS[rate_password(password)]
+
+    if strength_label.cget("text") != label:
+        strength_label.configure(text = label, text_color = color)
+    if strength_bar.get() != bar_value:
+        strength_bar.set(bar_value)
+
+def bind_strength_meter(entry, password_var, strength_label, strength_bar, delay_ms = STRENGTH_DELAY_MS):
+    """
+    Rate the password in password_var while it is typed into entry, once typing pauses for
+    delay_ms instead of on every key.
+    """
+    pending = {"job": None}
+
+    def schedule():
+        if pending["job"]:
+            entry.after_cancel(pending["job"])
+        pending["job"] = entry.after(delay_ms, update)
+
+    def update():
+        pending["job"] = None
+        password_strength(password_var.get(), strength_label, strength_bar)
+
+    entry.bind("<KeyRelease>", lambda event: schedule())
 
 def gen_set_password(password_var, password_confirm_var = None, strength_label = None, strength_bar = None, password_length = None, special_chars_num = None):
     """
@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from connectiono import get_connection, transaction
+from encryptiono import get_cipher, wrap_key, unwrap_key, encode_kdf_params
+
+# Rows read and committed per step, and threads sharing the AES-GCM work of each step.
+# OpenSSL releases the GIL while it encrypts, so the pool overlaps work across cores.
+REKEY_CHUNK_SIZE = 1000
+REKEY_WORKERS = min(4, os.cpu_count() or 1)
+
+def get_rekey_job(user_id):
+    """
+    Return the unfinished re-key job for a user as a dict, or None if there is none.
+    """
+    cursor = get_connection().execute("""select new_salt, new_kdf, new_kdf_params, new_password_hash, old_key_wrapped,
+                                         new_key_wrapped, last_rowid, new_wrapped_data_key from rekey_jobs where user_id = ?""", (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    keys = ("new_salt", "new_kdf", "new_kdf_params", "new_password_hash", "old_key_wrapped", "new_key_wrapped", "last_rowid", "new_wrapped_data_key")
+    return dict(zip(keys, row))
+
+def start_rekey(user_id, old_key, new_key, new_salt, new_kdf, new_kdf_params, new_password_hash = None, new_wrapped_data_key = None):
+    """
+    Record a durable re-key job before any row is touched. Each key is stored sealed by the
+    other, so an interrupted job can be resumed with either the old or the new master password.
+    new_wrapped_data_key is set when new_key is a data key: its copy sealed with the new master key.
+    """
+    with transaction() as cursor:
+        cursor.execute("""insert or replace into rekey_jobs(user_id, new_salt, new_kdf, new_kdf_params, new_password_hash,
+                          old_key_wrapped, new_key_wrapped, last_rowid, new_wrapped_data_key) values (?, ?, ?, ?, ?, ?, ?, 0, ?)""",
+                       (user_id, new_salt, new_kdf, encode_kdf_params(new_kdf_params), new_password_hash,
+                        wrap_key(new_key, old_key, b"cypher-rekey"), wrap_key(old_key, new_key, b"cypher-rekey"), new_wrapped_data_key))
+
+def recover_rekey_keys(job, old_key = None, new_key = None):
+    """
+    Given either key of a re-key job, unseal the other. Returns (old_key, new_key).
+    """
+    if new_key is not None:
+        return unwrap_key(new_key, job["old_key_wrapped"], b"cypher-rekey"), new_key
+    return old_key, unwrap_key(old_key, job["new_key_wrapped"], b"cypher-rekey")
+
+def _reencrypt_chunk(old_cipher, new_cipher, encrypted_passwords):
+    """
+    Re-encrypt a slice of values. A value that no longer decrypts comes back as None
+    and is left untouched rather than aborting a half-finished job.
+    """
+    try:
+        return new_cipher.encrypt_many(old_cipher.decrypt_many(encrypted_passwords))
+    except Exception:
+        pass
+
+    results = []
+    for encrypted_password in encrypted_passwords:
+        try:
+            results.append(new_cipher.encrypt(old_cipher.decrypt(encrypted_password)))
+        except Exception:
+            print('Skipping a login that could not be decrypted during re-encryption.')
+            results.append(None)
+    return results
+
+def run_rekey(user_id, old_key, new_key, chunk_size = REKEY_CHUNK_SIZE, workers = REKEY_WORKERS, progress = None):
+    """
+    Stream a user's logins in rowid order, re-encrypting each chunk across a thread pool and
+    writing it with executemany in one transaction together with the job's resume point.
+    Walking the table in storage order keeps reads and writes sequential, so the cost per
+    login stays flat as the vault grows.
+    Picks up after the last committed chunk if the job was interrupted.
+    Calls progress(done, total) after each chunk.
+    """
+    conn = get_connection()
+    old_cipher, new_cipher = get_cipher(old_key), get_cipher(new_key)
+    last_rowid = get_rekey_job(user_id)["last_rowid"]
+    total = conn.execute("select count(*) from passwords where user_id = ?", (user_id,)).fetchone()[0]
+    done = conn.execute("select count(*) from passwords where user_id = ? and rowid <= ?", (user_id, last_rowid)).fetchone()[0]
+    slice_size = max(1, -(-chunk_size // workers))
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        while True:
+            # +user_id keeps the planner on the rowid range instead of a user index plus a sort
+            rows = conn.execute("select rowid, encrypted_password from passwords where rowid > ? and +user_id = ? order by rowid limit ?",
+                                (last_rowid, user_id, chunk_size)).fetchall()
+            if not rows:
+                break
+
+            slices = [[encrypted_password for _, encrypted_password in rows[i:i + slice_size]] for i in range(0, len(rows), slice_size)]
+            new_encrypted_passwords = [value for part in pool.map(lambda part: _reencrypt_chunk(old_cipher, new_cipher, part), slices) for value in part]
+            last_rowid = rows[-1][0]
+
+            with transaction() as cursor:
+                cursor.executemany("update passwords set encrypted_password = ?, last_modified = current_timestamp where rowid = ?",
+                                   [(encrypted_password, rowid) for encrypted_password, (rowid, _) in zip(new_encrypted_passwords, rows)
+                                    if encrypted_password is not None])
+                cursor.execute("update rekey_jobs set last_rowid = ? where user_id = ?", (last_rowid, user_id))
+
+            done += len(rows)
+            if progress:
+                progress(done, total)
+
+def finish_rekey(user_id):
+    """
+    Apply the job's new salt, KDF settings, wrapped data key and (for password changes) password hash
+    to the user, drop the job and flag the change and the re-encrypted logins for upload, all in one transaction.
+    """
+    job = get_rekey_job(user_id)
+    with transaction() as cursor:
+        if job["new_password_hash"] is not None:
+            cursor.execute("update users set password_hash = ? where id = ?", (job["new_password_hash"], user_id))
+        if job["new_wrapped_data_key"] is not None:
+            cursor.execute("update users set wrapped_key = ? where id = ?", (job["new_wrapped_data_key"], user_id))
+        cursor.execute("update users set salt = ?, kdf = ?, kdf_params = ? where id = ?",
+                       (job["new_salt"], job["new_kdf"], job["new_kdf_params"], user_id))
+        cursor.execute("delete from rekey_jobs where user_id = ?", (user_id,))
+        cursor.execute("insert or replace into config (key, value) values (?, 'rows')", (f"key_push_pending:{user_id}",))
@@ -0,0 +1,75 @@
+import customtkinter as ctk
+from connectiono import data_version
+
+class ScreenManager:
+    """
+    Keeps one frame per screen inside a container and switches between them with
+    pack/pack_forget, so going back to a screen costs a repack instead of a rebuild.
+
+    A screen is built on first use by build(frame), which may return refresh(*args).
+    refresh is only called when the screen is shown with different arguments, or when
+    the database has been written to since the screen was last refreshed.
+    One-off pages (login details, edit forms) go through show_page and are rebuilt
+    every time; the previous page is destroyed when another screen is shown.
+    """
+    def __init__(self, container):
+        self.container = container
+        self.current = None
+        self._builders = {}
+        self._screens = {}
+        self._visible = None
+        self._page = None
+        self._last = None
+
+    def register(self, name, build):
+        """
+        Register build(frame) as the builder for a named screen.
+        """
+        self._builders[name] = build
+
+    def show(self, name, *args):
+        """
+        Show a registered screen, building it the first time and refreshing it if its
+        arguments or the data behind it changed since it was last shown.
+        """
+        screen = self._screens.get(name)
+        if screen is None:
+            frame = ctk.CTkFrame(self.container, fg_color = "transparent")
+            screen = {"frame": frame, "refresh": self._builders[name](frame), "state": None}
+            self._screens[name] = screen
+
+        state = (args, data_version())
+        if screen["refresh"] and screen["state"] != state:
+            screen["refresh"](*args)
+            screen["state"] = state
+
+        self._switch_to(screen["frame"])
+        self.current = name
+        self._last = (name, args)
+
+    def show_last(self):
+        """
+        Go back to the registered screen that was shown most recently, e.g. when leaving a page.
+        """
+        if self._last:
+            self.show(self._last[0], *self._last[1])
+
+    def show_page(self, build, *args):
+        """
+        Build a throwaway page with build(frame, *args) and show it in place of the current screen.
+        """
+        frame = ctk.CTkFrame(self.container, fg_color = "transparent")
+        build(frame, *args)
+        self._switch_to(frame)
+        self._page = frame
+        self.current = None
+
+    def _switch_to(self, frame):
+        if self._visible is not None and self._visible is not frame:
+            self._visible.pack_forget()
+        if self._page is not None and self._page is not frame:
+            self._page.destroy()
+            self._page = None
+
+        frame.pack(fill = "both", expand = True)
+        self._visible = frame
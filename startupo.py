@@ -0,0 +1,23 @@
+import os
+import sys
+import time
+
+# Set CYPHER_PROFILE_STARTUP=1 or pass --profile-startup to print a startup timeline.
+# For a per-module breakdown of the import stages, run with python -X importtime as well.
+PROFILE_STARTUP = os.environ.get("CYPHER_PROFILE_STARTUP", "") not in ("", "0") or "--profile-startup" in sys.argv
+
+_started = time.perf_counter()
+_last_mark = _started
+
+def mark(stage):
+    """
+    Record that a startup stage finished. When profiling, prints the time since startup
+    and how long the stage took.
+    """
+    global _last_mark
+    if not PROFILE_STARTUP:
+        return
+
+    now = time.perf_counter()
+    print(f"[startup] {(now - _started) * 1000:8.1f} ms  (+{(now - _last_mark) * 1000:7.1f} ms)  {stage}")
+    _last_mark = now
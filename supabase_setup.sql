@@ -0,0 +1,27 @@
+-- Schema changes Cypher needs in its Supabase project, on top of the api.users and api.passwords tables.
+-- Every statement can be run again safely; run the whole file in the Supabase SQL editor after updating Cypher.
+
+-- Pulls follow updated_at, stamped by the server on every insert and update. The last_modified column is
+-- set by the client that edited a login, so a login pushed late can carry an older time than the last pull.
+alter table api.passwords add column if not exists updated_at timestamptz not null default now();
+
+create or replace function api.touch_updated_at() returns trigger language plpgsql as $$
+begin
+    new.updated_at = now();
+    return new;
+end
+$$;
+
+drop trigger if exists passwords_touch_updated_at on api.passwords;
+create trigger passwords_touch_updated_at before insert or update on api.passwords
+    for each row execute function api.touch_updated_at();
+
+create index if not exists passwords_user_updated_at on api.passwords (user_id, updated_at, id);
+
+-- Key settings of each user's vault, so every device derives the same key from the master password.
+alter table api.users add column if not exists kdf text;
+alter table api.users add column if not exists kdf_params text;
+
+-- Each vault's data key, sealed with the key derived from the master password. Every device unseals this one
+-- key instead of making its own; base64 text, null until the first device moves the vault to a data key.
+alter table api.users add column if not exists wrapped_key text;
@@ -1,10 +1,52 @@
 import base64
-import sqlite3
-from tkinter import messagebox
-import httpx
-from encryptiono import generate_salt, hash_master_password
+import threading
+import time
+from datetime import datetime, timedelta
+from connectiono import get_connection, transaction
+from encryptiono import generate_salt, hash_master_password, wrap_key, unwrap_key
+from fuzzyo import index_websites
 
-DB_FILE = "cyphero.db"
+# Rows per upsert request, and retry policy for a chunk that hits a transient network error
+SYNC_BATCH_SIZE = 500
+SYNC_MAX_RETRIES = 3
+SYNC_RETRY_DELAY = 0.5
+
+# Rows per page when pulling changes from Supabase
+SYNC_PAGE_SIZE = 1000
+
+# Pulls follow updated_at, which a trigger from supabase_setup.sql stamps on every write. last_modified is set
+# by the client that edited a login, so a row pushed late can carry an older one. now() is when a write's
+# transaction started, so a row can become visible after a pull has read past its stamp. Each pull starts
+# SYNC_PULL_OVERLAP seconds before the watermark to catch those; the merge is idempotent.
+SYNC_PULL_OVERLAP = 60
+
+# Config key prefix of the pull watermark kept for each column pulls can follow
+PULL_WATERMARK_KEYS = {"updated_at": "pulled_until", "last_modified": "last_pulled"}
+
+class LazySupabaseClient:
+    """
+    Stands in for a Supabase client and creates the real one on first use.
+    Importing supabase (and httpx with it) takes longer than the rest of startup,
+    so offline sessions never pay for it. Thread-safe: login and sync run on worker threads.
+    """
+    def __init__(self, url, key):
+        self.url = url
+        self.key = key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        """
+        Return the real Supabase client, creating it on the first call.
+        """
+        with self._lock:
+            if self._client is None:
+                from supabase import create_client
+                self._client = create_client(self.url, self.key)
+            return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
 
 def supabase_register(email, password, supabase):
     """
@@ -51,11 +93,95 @@ def supabase_login(email, password, supabase):
         print(f"Supabase login failed. Check your credentials.")
         return None
 
+def _session_context(user_id):
+    return f"cypher-session:{user_id}".encode()
+
+def save_session(user_id, session, encryption_key):
+    """
+    Keep the refresh token of a Supabase session on disk, sealed with the vault key,
+    so the next unlock can resume the session instead of signing in with the password.
+    """
+    sealed_refresh_token = wrap_key(encryption_key, session.refresh_token.encode(), _session_context(user_id))
+    with transaction() as cursor:
+        cursor.execute("insert or replace into sessions (user_id, sealed_refresh_token, updated_on) values (?, ?, current_timestamp)",
+                       (user_id, sealed_refresh_token))
+
+def has_saved_session(user_id):
+    """
+    Return True if a sealed Supabase session is stored for the user.
+    """
+    return get_connection().execute("select 1 from sessions where user_id = ?", (user_id,)).fetchone() is not None
+
+def forget_session(user_id):
+    """
+    Delete the user's stored Supabase session.
+    """
+    with transaction() as cursor:
+        cursor.execute("delete from sessions where user_id = ?", (user_id,))
+
+def resume_session(user_id, encryption_key, supabase):
+    """
+    Bring the Supabase client online with the stored refresh token: one token refresh
+    request instead of a password sign-in. The new session is stored in place of the old one.
+    Returns False, and forgets the stored session, if it cannot be opened with this key
+    or Supabase rejects it; network errors propagate.
+    """
+    from cryptography.exceptions import InvalidTag
+    from supabase import AuthApiError, AuthSessionMissingError
+
+    row = get_connection().execute("select sealed_refresh_token from sessions where user_id = ?", (user_id,)).fetchone()
+    if not row:
+        return False
+
+    try:
+        refresh_token = unwrap_key(encryption_key, row[0], _session_context(user_id)).decode()
+        response = supabase.auth.refresh_session(refresh_token)
+    except (InvalidTag, AuthApiError, AuthSessionMissingError) as e:
+        print(f"Stored Supabase session is no longer valid: {e}")
+        forget_session(user_id)
+        return False
+
+    save_session(user_id, response.session, encryption_key)
+    return True
+
+_session_subscription = None
+
+def watch_session(user_id, encryption_key, supabase):
+    """
+    Re-save the sealed session whenever the client refreshes its tokens (refresh tokens are
+    single use), and forget it when the client signs out. Replaces any earlier watch.
+    """
+    global _session_subscription
+    unwatch_session()
+
+    def on_auth_change(event, session):
+        try:
+            if event == "TOKEN_REFRESHED" and session:
+                save_session(user_id, session, encryption_key)
+            elif event == "SIGNED_OUT":
+                forget_session(user_id)
+        except Exception as e:
+            print(f"Could not update the stored Supabase session: {e}")
+
+    _session_subscription = supabase.auth.on_auth_state_change(on_auth_change)
+
+def unwatch_session():
+    """
+    Stop keeping the stored session in step with the client, e.g. when the vault is locked.
+    """
+    global _session_subscription
+    if _session_subscription is not None:
+        _session_subscription.unsubscribe()
+        _session_subscription = None
+
 def insert_user_into_table(supabase_user_id, email, master_password, supabase):
     """
     Insert a new user record into the Supabase "users" table.
     Uses a service-role key; should not be exposed in client apps.
+    Returns True on success, False if Supabase could not be reached or rejected the insert.
     """
+    import httpx
+
     try:
         salt = generate_salt()
         salt_b64 = base64.b64encode(salt).decode("utf-8")
@@ -70,13 +196,15 @@ def insert_user_into_table(supabase_user_id, email, master_password, supabase):
                 "salt": salt_b64
             }).execute()
         except httpx.ConnectError:
-            messagebox.showwarning("No Internet Connection", "Could not reach Supabase")
-            return
+            print("No Internet Connection: Could not reach Supabase")
+            return False
 
         print("Supabase user inserted successfully.")
+        return True
 
     except Exception as e:
         print(f"Failed to add user into Supabase table: {e}")
+        return False
 
 def get_supabase_user_by_id(supabase_user_id, supabase):
     """
@@ -98,115 +226,179 @@ def get_local_passwords():
     """
     Fetch all locally stored passwords marked as syncable.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("select id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable from passwords where syncable = 1")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    cursor = get_connection().execute("select id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable from passwords where syncable = 1")
+    return cursor.fetchall()
 
 def get_last_synced_time():
     """
     Retrieve the timestamp of the last successful sync from config.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("select value from config where key = 'last_synced'")
+    cursor = get_connection().execute("select value from config where key = 'last_synced'")
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result else "2000-01-01 00:00:00"
 
 def set_last_synced_time():
     """
     Update the config table with the current timestamp for 'last_synced'.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("insert or replace into config (key, value) values (?, current_timestamp)", ("last_synced",))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        cursor.execute("insert or replace into config (key, value) values (?, current_timestamp)", ("last_synced",))
+
+def password_row_to_cloud(row):
+    """
+    Convert a local passwords row (as selected by get_local_passwords) into a Supabase record.
+    The raw ciphertext is base64-encoded here, once, for the JSON body; sync_from_supabase decodes it.
+    """
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "website": row[2],
+        "login_username": row[3],
+        "encrypted_password": base64.b64encode(row[4]).decode("utf-8"),
+        "created_on": row[5],
+        "last_modified": row[6],
+        "category": row[7],
+        "favorite": row[8],
+        "syncable": row[9]
+    }
 
-def sync_modified_rows_to_supabase(supabase):
+def upsert_in_batches(rows, supabase, batch_size = SYNC_BATCH_SIZE, max_retries = SYNC_MAX_RETRIES, progress = None):
+    """
+    Upsert local password rows to Supabase in chunks of batch_size, one request per chunk.
+    A chunk that fails with a transport error is retried with exponential backoff;
+    the error is re-raised once max_retries is exhausted.
+    Calls progress(confirmed, total) after each chunk. Returns the number of rows confirmed by the server.
+    """
+    import httpx
+
+    confirmed = 0
+    for start in range(0, len(rows), batch_size):
+        chunk = [password_row_to_cloud(row) for row in rows[start:start + batch_size]]
+
+        for attempt in range(max_retries + 1):
+            try:
+                supabase.schema("api").from_("passwords").upsert(chunk).execute()
+                break
+            except httpx.TransportError:
+                if attempt == max_retries:
+                    raise
+                time.sleep(SYNC_RETRY_DELAY * 2 ** attempt)
+
+        confirmed += len(chunk)
+        if progress:
+            progress(confirmed, len(rows))
+    return confirmed
+
+def sync_modified_rows_to_supabase(supabase, batch_size = SYNC_BATCH_SIZE, progress = None):
     """
     Push passwords modified since last sync to Supabase.
+    The last-synced time only advances once every batch has been confirmed.
+    Returns the number of rows pushed; network errors propagate to the caller.
     """
     last_synced_time = get_last_synced_time()
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("select id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable from passwords where last_modified > ? and syncable = 1", (last_synced_time,))
+    cursor = get_connection().execute("select id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable from passwords where last_modified > ? and syncable = 1", (last_synced_time,))
     rows = cursor.fetchall()
-    conn.close()
 
-    for row in rows:
-        encrypted_password = base64.b64encode(row[4]).decode('utf-8')
-        try:
-            supabase.schema("api").from_("passwords").upsert({
-                "id": row[0],
-                "user_id": row[1],
-                "website": row[2],
-                "login_username": row[3],
-                "encrypted_password": encrypted_password,
-                "created_on": row[5],
-                "last_modified": row[6],
-                "category": row[7],
-                "favorite": row[8],
-                "syncable": row[9]
-            }).execute()
-        except httpx.ConnectError:
-            messagebox.showwarning("No Internet Connection", "Could not reach Supabase")
-            return
+    pushed = upsert_in_batches(rows, supabase, batch_size, progress = progress)
     set_last_synced_time()
+    return pushed
 
-def sync_all_to_supabase(supabase):
+def sync_all_to_supabase(supabase, batch_size = SYNC_BATCH_SIZE, progress = None):
     """
     Push all local passwords to Supabase, regardless of modification time.
+    The last-synced time only advances once every batch has been confirmed.
+    Returns the number of rows pushed; network errors propagate to the caller.
     """
     local_passwords = get_local_passwords()
-    for row in local_passwords:
-        encrypted_password = base64.b64encode(row[4]).decode("utf-8")
-        try:
-            supabase.schema("api").from_("passwords").upsert({
-                "id": row[0],
-                "user_id": row[1],
-                "website": row[2],
-                "login_username": row[3],
-                "encrypted_password": encrypted_password,
-                "created_on": row[5],
-                "last_modified": row[6],
-                "category": row[7],
-                "favorite": row[8],
-                "syncable": row[9]
-            }).execute()
-        except httpx.ConnectError:
-            messagebox.showwarning("No Internet Connection", "Could not reach Supabase")
-            return
 
-def sync_from_supabase(user_id, supabase):
+    pushed = upsert_in_batches(local_passwords, supabase, batch_size, progress = progress)
+    set_last_synced_time()
+    return pushed
+
+def is_missing_column_error(error):
+    """
+    Return True if a PostgREST error says a column does not exist, meaning the
+    Supabase project still needs the migrations in supabase_setup.sql.
+    """
+    return getattr(error, "code", None) in ("42703", "PGRST204")
+
+def get_last_pulled_time(user_id, column = "updated_at"):
+    """
+    Retrieve the pull watermark for a user: the largest value of column among the rows pulled so far, or None before the first pull.
+    """
+    cursor = get_connection().execute("select value from config where key = ?", (f"{PULL_WATERMARK_KEYS[column]}:{user_id}",))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def fetch_cloud_changes(user_id, since, supabase, page_size = SYNC_PAGE_SIZE, progress = None, column = "updated_at"):
     """
-    Fetch cloud-stored passwords for a user and merge them into local database.
+    Fetch a user's cloud passwords whose column is at or after `since` (all of them when it is None),
+    paging through the results with range requests ordered by that column.
+    Calls progress(fetched, None) after each page, since the total is not known up front.
+    """
+    rows = []
+    start = 0
+    while True:
+        query = supabase.schema("api").from_("passwords").select("*").eq("user_id", user_id)
+        if since is not None:
+            query = query.gte(column, since)
+        response = query.order(column).order("id").range(start, start + page_size - 1).execute()
+        rows.extend(response.data)
+        if progress:
+            progress(len(rows), None)
+        if len(response.data) < page_size:
+            return rows
+        start += page_size
+
+def sync_from_supabase(user_id, supabase, progress = None):
+    """
+    Fetch cloud-stored passwords written since the last pull and merge them into the local database.
+    The merge is a single bulk upsert that keeps the newer copy of each row, and the
+    pull watermark, the newest server-set updated_at, advances in the same transaction.
+    A project without the updated_at column is pulled by last_modified instead, as before it existed.
+    Returns the number of rows pulled; network errors propagate to the caller.
     """
     try:
-        response = supabase.schema("api").from_("passwords").select("*").eq("user_id", user_id).execute()
-    except httpx.ConnectError:
-        messagebox.showwarning("No Internet Connection", "Could not reach Supabase")
-        return
-
-    cloud_passwords = response.data
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    for entry in cloud_passwords:
-        decoded_password = base64.b64decode(entry["encrypted_password"])
-        cursor.execute("select last_modified, syncable from passwords where id = ?", (entry["id"],))
-        row = cursor.fetchone()
-
-        if not row:
-            cursor.execute("insert into passwords(id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable) values (?, ?, ?, ?, ?, ?, ? ,?, ?, ?)",
-                           (entry["id"], entry["user_id"], entry["website"], entry["login_username"], decoded_password, entry["created_on"], entry["last_modified"], entry["category"], entry["favorite"], entry["syncable"]))
-        else:
-            if entry["last_modified"] > row[0] or entry["syncable"] != row[1]:
-                cursor.execute("update passwords set website = ?, login_username = ?, encrypted_password = ?, created_on = ?, last_modified = ?, category = ?, favorite = ?, syncable = ? where id = ?",(
-                    entry["website"], entry["login_username"], decoded_password, entry["created_on"], entry["last_modified"], entry["category"], entry["favorite"], entry["syncable"], entry["id"]))
+        return _merge_cloud_changes(user_id, supabase, "updated_at", progress)
+    except Exception as e:
+        if not is_missing_column_error(e):
+            raise
+        print("The Supabase passwords table has no updated_at column; run supabase_setup.sql. "
+              "Pulling by last_modified, which misses logins pushed late with an older time.")
+        return _merge_cloud_changes(user_id, supabase, "last_modified", progress)
+
+def _merge_cloud_changes(user_id, supabase, column, progress):
+    watermark = get_last_pulled_time(user_id, column)
+    if watermark and column == "updated_at":
+        watermark = (datetime.fromisoformat(watermark) - timedelta(seconds = SYNC_PULL_OVERLAP)).isoformat()
+    cloud_passwords = fetch_cloud_changes(user_id, watermark, supabase, progress = progress, column = column)
+
+    if not cloud_passwords:
+        return 0
+
+    rows = [(entry["id"], entry["user_id"], entry["website"], entry["login_username"], base64.b64decode(entry["encrypted_password"]),
+             entry["created_on"], entry["last_modified"], entry["category"], entry["favorite"], entry["syncable"]) for entry in cloud_passwords]
+    # Rows arrive ordered by the watermark column, so the last one carries the new watermark
+    watermark = cloud_passwords[-1][column]
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with transaction() as cursor:
+        cursor.executemany("""
+        insert into passwords(id, user_id, website, login_username, encrypted_password, created_on, last_modified, category, favorite, syncable)
+        values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        on conflict(id) do update set
+        website = excluded.website,
+        login_username = excluded.login_username,
+        encrypted_password = excluded.encrypted_password,
+        created_on = excluded.created_on,
+        last_modified = excluded.last_modified,
+        category = excluded.category,
+        favorite = excluded.favorite,
+        syncable = excluded.syncable
+        where excluded.last_modified > passwords.last_modified or excluded.syncable != passwords.syncable
+        """, rows)
+        index_websites(cursor, user_id, [entry["website"] for entry in cloud_passwords])
+        cursor.execute("insert or replace into config (key, value) values (?, ?)", (f"{PULL_WATERMARK_KEYS[column]}:{user_id}", watermark))
+        if column == "updated_at":
+            # Watermarks taken from client-set last_modified are not comparable with updated_at
+            cursor.execute("delete from config where key = ?", (f"{PULL_WATERMARK_KEYS['last_modified']}:{user_id}",))
+    return len(rows)
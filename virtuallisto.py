@@ -0,0 +1,147 @@
+import customtkinter as ctk
+from collections import OrderedDict
+
+# Height of one list row: a 36px button plus 5px padding above and below
+ROW_HEIGHT = 46
+
+# Rows fetched per database round trip, and how many fetched pages are kept around
+PAGE_SIZE = 100
+PAGE_CACHE_SIZE = 8
+
+class PagedRows:
+    """
+    Random access to a long result set that is fetched from the database one page at a time.
+    fetch_page(offset, limit) must return the rows in that window; only the PAGE_CACHE_SIZE
+    most recently used pages stay in memory.
+    """
+    def __init__(self, fetch_page, total, page_size = PAGE_SIZE, cache_size = PAGE_CACHE_SIZE):
+        self.fetch_page = fetch_page
+        self.total = total
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+
+        page_number, position = divmod(index, self.page_size)
+        page = self._pages.get(page_number)
+        if page is None:
+            page = self.fetch_page(page_number * self.page_size, self.page_size)
+            self._pages[page_number] = page
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last = False)
+        else:
+            self._pages.move_to_end(page_number)
+
+        # The table can shrink under us (e.g. a sync deleted rows); treat missing rows as the end
+        if position >= len(page):
+            raise IndexError(index)
+        return page[position]
+
+class VirtualList(ctk.CTkFrame):
+    """
+    A scrolling list of buttons that only builds widgets for the rows that fit on screen.
+    Scrolling moves a window over `rows` (any sequence, usually PagedRows) and relabels the
+    same pooled buttons instead of creating new ones, so the widget count stays constant
+    however many rows there are.
+    format_row(row) gives a button's text and on_select(row) is called when it is clicked.
+    """
+    def __init__(self, master, rows, format_row, on_select, row_height = ROW_HEIGHT, **kwargs):
+        super().__init__(master, **kwargs)
+        self.rows = rows
+        self.format_row = format_row
+        self.on_select = on_select
+        self.row_height = row_height
+        self.first = 0
+        self._pool = []
+        self._shown = 0
+
+        self._body = ctk.CTkFrame(self, fg_color = "transparent")
+        self._body.pack(side = "left", fill = "both", expand = True)
+
+        self._scrollbar = ctk.CTkScrollbar(self, command = self._on_scrollbar)
+        self._scrollbar.pack(side = "right", fill = "y")
+
+        self._body.bind("<Configure>", lambda e: self._render())
+        self._bind_wheel(self._body)
+        self._render()
+
+    def set_rows(self, rows, first = 0):
+        """
+        Show a different sequence of rows starting at `first`, reusing the existing buttons.
+        """
+        self.rows = rows
+        self.first = max(0, min(first, len(rows) - self._visible_count()))
+        self._render()
+
+    def scroll_to(self, index):
+        """
+        Make `index` the first visible row, clamped so the list never scrolls past its end.
+        """
+        index = max(0, min(int(index), len(self.rows) - self._visible_count()))
+        if index != self.first:
+            self.first = index
+            self._render()
+
+    def _visible_count(self):
+        return max(1, self._body.winfo_height() // self.row_height)
+
+    def _render(self):
+        visible = max(0, min(len(self.rows) - self.first, self._visible_count()))
+
+        shown = 0
+        for slot in range(visible):
+            try:
+                text = self.format_row(self.rows[self.first + slot])
+            except IndexError:
+                break
+
+            if slot == len(self._pool):
+                # Created with its text so the label exists before the wheel bindings are added
+                button = ctk.CTkButton(self._body, text = text, width = 120, height = 36, corner_radius = 6, font = ("Tahoma", 13), command = lambda slot = slot: self._select(slot))
+                self._bind_wheel(button)
+                self._pool.append(button)
+            elif self._pool[slot].cget("text") != text:
+                self._pool[slot].configure(text = text)
+            shown += 1
+
+        # Hidden buttons are always a suffix of the pool, so re-packing in slot order keeps rows in order
+        for slot in range(self._shown, shown):
+            self._pool[slot].pack(pady = 5)
+        for slot in range(shown, self._shown):
+            self._pool[slot].pack_forget()
+        self._shown = shown
+
+        total = len(self.rows)
+        if total:
+            self._scrollbar.set(self.first / total, (self.first + shown) / total)
+        else:
+            self._scrollbar.set(0, 1)
+
+    def _select(self, slot):
+        if slot < self._shown:
+            self.on_select(self.rows[self.first + slot])
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(float(args[0]) * len(self.rows))
+        elif action == "scroll":
+            step = int(args[0])
+            if len(args) > 1 and args[1] == "pages":
+                step *= self._visible_count()
+            self.scroll_to(self.first + step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - 3)
+        elif event.num == 5 or event.delta < 0:
+            self.scroll_to(self.first + 3)
+
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel, add = "+")
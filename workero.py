@@ -0,0 +1,75 @@
+import queue
+import threading
+
+POLL_INTERVAL_MS = 50
+
+class BackgroundWorker:
+    """
+    Runs one job at a time on a dedicated daemon thread so the Tk main loop never blocks.
+    Progress reports and results are handed back to the main thread by polling with widget.after,
+    because Tk widgets must only be touched from the thread that created them.
+    """
+    def __init__(self, widget, name = "cypher-worker"):
+        self.widget = widget
+        self._jobs = queue.Queue()
+        self._events = queue.Queue()
+        self._busy = False
+        self._polling = False
+        threading.Thread(target = self._run, name = name, daemon = True).start()
+
+    @property
+    def busy(self):
+        """
+        True while a submitted job is running or its result has not been delivered yet.
+        """
+        return self._busy
+
+    def submit(self, job, on_done = None, on_error = None, on_progress = None):
+        """
+        Run job(progress) on the worker thread. progress(*args) forwards to on_progress.
+        on_done(result) or on_error(exception) is then called on the main thread.
+        Returns False without queueing anything if a job is already in flight.
+        """
+        if self._busy:
+            return False
+        self._busy = True
+        self._jobs.put((job, on_done, on_error, on_progress))
+        self._schedule_poll()
+        return True
+
+    def _run(self):
+        while True:
+            job, on_done, on_error, on_progress = self._jobs.get()
+
+            def progress(*args):
+                if on_progress:
+                    self._events.put((on_progress, args, False))
+
+            try:
+                result = job(progress)
+            except Exception as e:
+                self._events.put((on_error, (e,), True))
+            else:
+                self._events.put((on_done, (result,), True))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                callback, args, finished = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if finished:
+                self._busy = False
+            if callback:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f'Background job callback failed: {e}')
+        if self._busy:
+            self._schedule_poll()